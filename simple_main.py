@@ -4,80 +4,902 @@ Minimal Face Tracking System - Error-Free Version
 This version focuses on getting a working system with basic face detection and tracking.
 """
 
+import time
+_IMPORT_START = time.perf_counter()
+
 import cv2
 import numpy as np
-import time
 import os
 import sys
 import argparse
 import sqlite3
 import json
+import threading
+import queue
+import itertools
+import importlib.util
+import platform
+import mmap
+import atexit
+import re
+import struct
+from concurrent.futures import Future
+from contextlib import contextmanager
 from datetime import datetime
-from collections import OrderedDict
-from scipy.spatial import distance as dist
-
-# Check if YOLO is available
-try:
-    from ultralytics import YOLO
-    YOLO_AVAILABLE = True
-    print("✅ YOLOv8 available")
-except ImportError:
-    YOLO_AVAILABLE = False
-    print("⚠️  YOLOv8 not available, using OpenCV face detection")
+from collections import OrderedDict, deque
+
+# Heavy optional modules (ultralytics -> torch, onnxruntime, openvino, scipy) are
+# only checked for here and imported when the selected backend needs them
+YOLO_AVAILABLE = importlib.util.find_spec("ultralytics") is not None
+
+# CPU inference engines for exported ONNX models
+ONNXRUNTIME_AVAILABLE = importlib.util.find_spec("onnxruntime") is not None
+OPENVINO_AVAILABLE = importlib.util.find_spec("openvino") is not None
+
+DEFAULT_YOLO_WEIGHTS = "yolov8n.pt"
+DEFAULT_ONNX_MODEL = os.path.join("models", "yolov8n.onnx")
+
+# OpenCV face models (download into models/ to enable them)
+YUNET_MODEL = os.path.join("models", "face_detection_yunet_2023mar.onnx")
+SSD_PROTOTXT = os.path.join("models", "deploy.prototxt")
+SSD_MODEL = os.path.join("models", "res10_300x300_ssd_iter_140000.caffemodel")
+DETECTOR_CACHE = os.path.join("data", "detector_choice.json")
+
+class StartupTimer:
+    """Collect startup phase timings for --startup-report"""
+    def __init__(self, origin):
+        self.origin = origin
+        self.phases = OrderedDict()
+        self.lock = threading.Lock()
+        self.first_frame = None
+        self.enabled = False  # Print the report after the first frame
+
+    def record(self, phase, seconds):
+        """Add time spent in a phase"""
+        with self.lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def measure(self, phase):
+        """Time a block as a startup phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - start)
+
+    def mark_first_frame(self):
+        """Record time-to-first-processed-frame, returns True the first time"""
+        if self.first_frame is not None:
+            return False
+        self.first_frame = time.perf_counter() - self.origin
+        return True
+
+    def report(self):
+        """Startup breakdown as printable lines"""
+        with self.lock:
+            lines = ["Startup report:"]
+            for phase, seconds in self.phases.items():
+                lines.append(f"  {phase:<28} {seconds * 1000:8.1f} ms")
+            if self.first_frame is not None:
+                lines.append(f"  {'first frame (total)':<28} {self.first_frame * 1000:8.1f} ms")
+            return lines
+
+STARTUP = StartupTimer(_IMPORT_START)
+STARTUP.record("imports (cv2, numpy, stdlib)", time.perf_counter() - _IMPORT_START)
+
+# Detector registry: name -> init method and rough relative accuracy on
+# frontal faces. The accuracy values are fixed prior scores, not measured on
+# the input; --detector auto only times the candidates and checks these
+# priors against --accuracy-floor.
+DETECTOR_REGISTRY = OrderedDict([
+    ("yolo", {"init": "_init_yolo_detector", "accuracy": 0.85}),
+    ("yunet", {"init": "_init_yunet_detector", "accuracy": 0.88}),
+    ("ssd", {"init": "_init_ssd_detector", "accuracy": 0.80}),
+    ("haar", {"init": "_init_opencv_detector", "accuracy": 0.60}),
+])
+
+# Shared "no detections" result, (N, 5) columns: x, y, w, h, confidence
+EMPTY_DETECTIONS = np.empty((0, 5), dtype=np.float32)
+EMPTY_DETECTIONS.flags.writeable = False
+
+class SegmentArchive:
+    """Append-only archive of encoded images in size-rotated segment files
+
+    Images are appended to segment_NNNNNN.bin until it would exceed
+    max_segment_bytes, then the next segment is started. Each segment has a
+    sidecar .idx file of packed (offset, length, name) records. An image is
+    referenced as "segment_NNNNNN.bin:offset:length" and read back by random
+    access through mmap.
+    """
+    INDEX_RECORD = struct.Struct("<QIH")  # offset, length, name length (name bytes follow)
+    REFERENCE = re.compile(r"^(segment_\d+\.bin):(\d+):(\d+)$")
+
+    def __init__(self, directory=os.path.join("logs", "archive"), max_segment_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.maps = {}  # segment name -> mmap for reads
+        self.segment = None
+        self.data_file = None
+        self.index_file = None
+
+        # Continue the newest segment
+        segments = self.segments()
+        self._open(int(segments[-1][8:14]) if segments else 1)
+
+    def segments(self):
+        """Segment file names, oldest first"""
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.startswith("segment_") and name.endswith(".bin"))
+
+    def _open(self, number):
+        """Open segment number for appending"""
+        if self.data_file is not None:
+            self.data_file.close()
+            self.index_file.close()
+        self.segment = f"segment_{number:06d}.bin"
+        self.data_file = open(os.path.join(self.directory, self.segment), "ab")
+        self.index_file = open(os.path.join(self.directory, self.segment[:-4] + ".idx"), "ab")
+
+    def append(self, name, data):
+        """Append encoded image bytes, returns the "segment:offset:length" reference"""
+        encoded_name = name.encode("utf-8")[:65535]
+        with self.lock:
+            offset = self.data_file.tell()
+            if offset and offset + len(data) > self.max_segment_bytes:
+                self._open(int(self.segment[8:14]) + 1)
+                offset = 0
+            self.data_file.write(data)
+            self.index_file.write(self.INDEX_RECORD.pack(offset, len(data), len(encoded_name)) + encoded_name)
+            return f"{self.segment}:{offset}:{len(data)}"
+
+    def flush(self):
+        """Push appended images and index records to disk"""
+        with self.lock:
+            for handle in (self.data_file, self.index_file):
+                handle.flush()
+                os.fsync(handle.fileno())
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.data_file.close()
+            self.index_file.close()
+            for mapped in self.maps.values():
+                mapped.close()
+            self.maps.clear()
+
+    @classmethod
+    def is_reference(cls, image_path):
+        return isinstance(image_path, str) and cls.REFERENCE.match(image_path) is not None
+
+    def read(self, reference):
+        """Encoded bytes for a reference (random access through mmap)"""
+        segment, offset, length = self.REFERENCE.match(reference).groups()
+        offset, length = int(offset), int(length)
+        with self.lock:
+            if segment == self.segment:
+                self.data_file.flush()
+            mapped = self.maps.get(segment)
+            if mapped is None or len(mapped) < offset + length:
+                # (Re)map: the active segment grows while we append
+                if mapped is not None:
+                    mapped.close()
+                with open(os.path.join(self.directory, segment), "rb") as handle:
+                    mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+                self.maps[segment] = mapped
+            return mapped[offset:offset + length]
+
+    def load_image(self, reference):
+        """Decoded BGR image for a reference"""
+        return cv2.imdecode(np.frombuffer(self.read(reference), dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    def entries(self, segment):
+        """(name, reference) for every image in a segment, from its index"""
+        with open(os.path.join(self.directory, segment[:-4] + ".idx"), "rb") as handle:
+            index = handle.read()
+        position = 0
+        while position + self.INDEX_RECORD.size <= len(index):
+            offset, length, name_length = self.INDEX_RECORD.unpack_from(index, position)
+            position += self.INDEX_RECORD.size
+            name = index[position:position + name_length].decode("utf-8")
+            position += name_length
+            yield name, f"{segment}:{offset}:{length}"
+
+    def export(self, output_dir):
+        """Write every archived image back out as a plain file, returns the count"""
+        self.flush()
+        os.makedirs(output_dir, exist_ok=True)
+        count = 0
+        for segment in self.segments():
+            for name, reference in self.entries(segment):
+                with open(os.path.join(output_dir, os.path.basename(name)), "wb") as handle:
+                    handle.write(self.read(reference))
+                count += 1
+        return count
+
+class ImageWriter:
+    """Background image encoder/writer pool
+
+    Images are queued and encoded + written by worker threads (cv2.imencode
+    and file writes release the GIL), so frame latency doesn't depend on disk
+    speed. The queue is bounded: with the "drop" policy a full queue drops
+    the new image, with "block" the caller waits for a free slot. With an
+    archive, images are appended to its segments instead of separate files.
+    Write failures go to the logger (a SimpleLogger adopts its writer).
+    """
+    POLICIES = ("drop", "block")
+    FORMATS = {"jpg": cv2.IMWRITE_JPEG_QUALITY, "webp": cv2.IMWRITE_WEBP_QUALITY}
+
+    def __init__(self, workers=2, queue_size=64, policy="drop", image_format="jpg", quality=90, archive=None,
+                 logger=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown image queue policy: {policy}")
+        if image_format not in self.FORMATS:
+            raise ValueError(f"Unknown image format: {image_format}")
+
+        self.workers = max(1, int(workers))
+        self.policy = policy
+        self.extension = "." + image_format
+        self.params = [self.FORMATS[image_format], int(quality)]
+        self.archive = archive
+        self.logger = logger
+        self.queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.threads = []
+        self.lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def _start(self):
+        """Start the worker threads on first use"""
+        with self.lock:
+            if not self.threads:
+                for i in range(self.workers):
+                    thread = threading.Thread(target=self._work, name=f"image-writer-{i}", daemon=True)
+                    thread.start()
+                    self.threads.append(thread)
+
+    def _work(self):
+        """Worker loop: encode and write until the stop sentinel"""
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                path, image, result = item
+                ok, encoded = cv2.imencode(self.extension, image, self.params)
+                if not ok:
+                    raise ValueError("encoding failed")
+                if self.archive is not None:
+                    path = self.archive.append(path, encoded.tobytes())
+                else:
+                    encoded.tofile(path)
+                result.set_result(path)
+                with self.lock:
+                    self.written += 1
+            except Exception as e:
+                with self.lock:
+                    self.failed += 1
+                # Keyed, so a failing disk is rate limited instead of logging every image
+                (self.logger or get_logger()).error(f"Error saving image {item[0]}: {e}",
+                                                    key="image.write", path=item[0])
+                item[2].set_result(None)
+            finally:
+                self.queue.task_done()
+
+    def submit(self, path, image):
+        """Queue an image for writing
+
+        Returns a Future of the written path (the segment reference with an
+        archive; None if writing failed), or None if the image was dropped.
+        """
+        if not self.threads:
+            self._start()
+        result = Future()
+        try:
+            self.queue.put((path, image, result), block=self.policy == "block")
+            return result
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return None
+
+    def flush(self):
+        """Wait until every queued image is on disk"""
+        if self.threads:
+            self.queue.join()
+        if self.archive is not None:
+            self.archive.flush()
+
+    def close(self):
+        """Flush and stop the workers"""
+        self.flush()
+        with self.lock:
+            threads, self.threads = self.threads, []
+        for _ in threads:
+            self.queue.put(None)
+        for thread in threads:
+            thread.join()
+        if self.archive is not None:
+            self.archive.close()
+
+    def get_stats(self):
+        return {'written': self.written, 'dropped': self.dropped, 'failed': self.failed,
+                'queued': self.queue.qsize()}
+
+def dhash(image):
+    """64-bit difference hash: brightness gradients of a 9x8 thumbnail"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    thumbnail = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+def _popcount(values):
+    """Set bits per uint64 element"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+class HashDeduplicator:
+    """Bounded index of recent image hashes with Hamming-distance lookup
+
+    A crop whose dHash is within max_distance bits of one saved in the same
+    scope (camera) during the last ttl seconds is a near-duplicate and reuses
+    that image's reference instead of a new write. The short window keeps
+    the match to the same person lingering at the line; when the index is
+    full the least recently used hash is evicted.
+    """
+    def __init__(self, capacity=256, max_distance=3, ttl=10.0):
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.hashes = np.zeros(capacity, dtype=np.uint64)
+        self.references = [None] * capacity
+        self.scopes = [None] * capacity
+        self.added = np.zeros(capacity)  # Monotonic time the image was saved
+        self.last_used = np.full(capacity, -1, dtype=np.int64)  # -1 = free
+        self.clock = itertools.count()
+        self.lock = threading.Lock()
+        self.duplicates = 0
+
+    def lookup(self, image_hash, scope):
+        """Reference of the closest recent near-duplicate in scope, or None"""
+        with self.lock:
+            # Expired hashes free their rows
+            self.last_used[(self.last_used >= 0) & (time.monotonic() - self.added > self.ttl)] = -1
+
+            used = [row for row in np.flatnonzero(self.last_used >= 0).tolist() if self.scopes[row] == scope]
+            if not used:
+                return None
+            distances = _popcount(self.hashes[used] ^ np.uint64(image_hash))
+            best = int(np.argmin(distances))
+            if distances[best] > self.max_distance:
+                return None
+            row = used[best]
+            self.last_used[row] = next(self.clock)
+            self.duplicates += 1
+            return self.references[row]
+
+    def add(self, image_hash, reference, scope):
+        """Remember a written image, evicting the least recently used hash when full"""
+        with self.lock:
+            row = int(np.argmin(self.last_used))  # A free row (-1) or the LRU one
+            self.hashes[row] = image_hash
+            self.references[row] = reference
+            self.scopes[row] = scope
+            self.added[row] = time.monotonic()
+            self.last_used[row] = next(self.clock)
+
+    def get_stats(self):
+        return {'duplicates': self.duplicates, 'indexed': int((self.last_used >= 0).sum())}
 
 class SimpleLogger:
-    """Simple logging system"""
-    def __init__(self):
+    """Simple logging system
+
+    log() only filters, rate-limits and queues a record; one background
+    writer prints it and appends it as a JSON line to logs/system.log
+    (buffered, rotated by size and/or age). Messages with a key are limited
+    to one per rate_limit seconds, later ones are counted and reported with
+    the next record for that key. One logger is shared per process (see
+    get_logger), so all components write through the same queue.
+    """
+    LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+    def __init__(self, image_writer=None, deduplicator=None, level="INFO", max_bytes=10 * 1024 * 1024,
+                 rotate_seconds=None, backup_count=5, rate_limit=10.0, queue_size=10000):
         self.log_dir = "logs"
         self.image_dir = os.path.join(self.log_dir, "images")
         os.makedirs(self.log_dir, exist_ok=True)
         os.makedirs(self.image_dir, exist_ok=True)
 
-        # Setup log file
+        # Setup log file (JSON lines)
         self.log_file = os.path.join(self.log_dir, "system.log")
+        self.level = self.LEVELS[level]
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backup_count = backup_count
+
+        # Per-key rate limiting: key -> [last emitted time, suppressed count]
+        self.rate_limit = rate_limit
+        self.limits = {}
+        self.limits_lock = threading.Lock()
+
+        # Records go through a bounded queue to a single writer thread
+        self.records = queue.Queue(maxsize=queue_size)
+        self.dropped_records = 0
+        self.writer = None
+        self.writer_lock = threading.Lock()
+
+        # Images are written in the background; a counter keeps names unique within a second
+        self.image_writer = image_writer or ImageWriter()
+        if self.image_writer.logger is None:
+            self.image_writer.logger = self
+        self.image_counter = itertools.count()
+
+        # Optional near-duplicate check for face crops (see save_image)
+        self.deduplicator = deduplicator
+
+    def log(self, message, level="INFO", key=None, **fields):
+        """Queue a log record (never waits on I/O; extra fields go into the JSON line)"""
+        if self.LEVELS[level] < self.level:
+            return
 
-    def log(self, message):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] {message}"
-        print(log_entry)
-
-        # Write to file
+        # Repeated messages with the same key are rate limited
+        if key is not None:
+            now = time.monotonic()
+            with self.limits_lock:
+                limit = self.limits.get(key)
+                if limit is not None and now - limit[0] < self.rate_limit:
+                    limit[1] += 1
+                    return
+                if limit is not None and limit[1]:
+                    fields['suppressed'] = limit[1]
+                self.limits[key] = [now, 0]
+            fields['key'] = key
+
+        record = {'time': datetime.now().isoformat(timespec='milliseconds'), 'level': level,
+                  'message': message}
+        record.update(fields)
+
+        if self.writer is None:
+            self._start()
         try:
-            with open(self.log_file, 'a') as f:
-                f.write(log_entry + "\n")
-        except:
-            pass  # Ignore file write errors
-
-    def save_image(self, image, name):
-        """Save image with timestamp"""
+            self.records.put_nowait(record)
+        except queue.Full:
+            self.dropped_records += 1
+
+    def debug(self, message, **fields):
+        self.log(message, "DEBUG", **fields)
+
+    def warning(self, message, **fields):
+        self.log(message, "WARNING", **fields)
+
+    def error(self, message, **fields):
+        self.log(message, "ERROR", **fields)
+
+    def _start(self):
+        """Start the writer thread on first use"""
+        with self.writer_lock:
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._write_loop, name="log-writer", daemon=True)
+                self.writer.start()
+                atexit.register(self.close)  # Records queued at exit still reach the file
+
+    def _rotate(self, handle):
+        """Shift system.log -> system.log.1 -> ... and open a fresh file"""
+        handle.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.log_file}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.log_file}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.log_file, f"{self.log_file}.1")
+        else:
+            os.remove(self.log_file)
+        return open(self.log_file, "ab", buffering=64 * 1024)
+
+    def _write_loop(self):
+        """Writer thread: print and append queued records, flush when idle
+
+        The file size is tracked here (tell() would flush the buffer on every
+        record), seeded from the existing file.
+        """
+        handle = open(self.log_file, "ab", buffering=64 * 1024)
+        size = os.path.getsize(self.log_file)
+        opened = time.monotonic()
+        while True:
+            record = self.records.get()
+            try:
+                if record is None:
+                    handle.close()
+                    return
+                suppressed = f" (+{record['suppressed']} suppressed)" if 'suppressed' in record else ""
+                print(f"[{record['time'][:19].replace('T', ' ')}] {record['message']}{suppressed}")
+                try:
+                    line = (json.dumps(record, default=str) + "\n").encode("utf-8")
+                    handle.write(line)
+                    size += len(line)
+                    if size >= self.max_bytes or (
+                            self.rotate_seconds and time.monotonic() - opened >= self.rotate_seconds):
+                        handle = self._rotate(handle)
+                        size, opened = 0, time.monotonic()
+                    elif self.records.empty():
+                        handle.flush()
+                except OSError:
+                    pass  # Ignore file write errors
+            finally:
+                self.records.task_done()
+
+    def flush(self):
+        """Wait until every queued record is written"""
+        if self.writer is not None:
+            self.records.join()
+
+    def close(self):
+        """Write the queued records, close the file and stop the writer"""
+        with self.writer_lock:
+            writer, self.writer = self.writer, None
+        if writer is not None:
+            self.records.put(None)
+            writer.join()
+
+    def save_image(self, image, name, dedup_scope=None):
+        """Queue image for saving with timestamp
+
+        Returns its path, or with an archive a Future of its segment
+        reference (SimpleDatabase.log_event accepts both); None if dropped.
+        With a dedup_scope (camera) and a deduplicator, a near-duplicate of a
+        recent image in that scope returns that image's reference without
+        writing.
+        """
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{name}_{timestamp}.jpg"
+            image_hash = None
+            if dedup_scope is not None and self.deduplicator is not None:
+                image_hash = dhash(image)
+                reference = self.deduplicator.lookup(image_hash, dedup_scope)
+                if reference is not None:
+                    return reference
+
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+            filename = f"{name}_{timestamp}_{next(self.image_counter)}{self.image_writer.extension}"
             path = os.path.join(self.image_dir, filename)
-            cv2.imwrite(path, image)
-            return path
+            if self.image_writer.archive is not None:
+                path = filename  # Name recorded in the segment index
+            result = self.image_writer.submit(path, image)
+            if result is None:
+                self.warning(f"Image queue full, dropped {filename}", key="image.dropped")
+                return None
+            reference = path if self.image_writer.archive is None else result
+            if image_hash is not None:
+                self.deduplicator.add(image_hash, reference, dedup_scope)
+            return reference
         except Exception as e:
-            self.log(f"Error saving image: {e}")
+            self.error(f"Error saving image: {e}", key="image.error")
             return None
 
+    def flush_images(self):
+        """Block until all queued images are written"""
+        self.image_writer.flush()
+
+_SHARED_LOGGER = None
+
+def get_logger():
+    """Process-wide default logger (created on first use)"""
+    global _SHARED_LOGGER
+    if _SHARED_LOGGER is None:
+        _SHARED_LOGGER = SimpleLogger()
+    return _SHARED_LOGGER
+
+def set_logger(logger):
+    """Make logger the process-wide default"""
+    global _SHARED_LOGGER
+    _SHARED_LOGGER = logger
+    return logger
+
+def _tile_spans(length, count, overlap):
+    """Start/size of count overlapping spans covering length"""
+    if count <= 1:
+        return [(0, length)]
+    size = int(np.ceil(length / (count - (count - 1) * overlap)))
+    step = (length - size) / (count - 1)
+    return [(int(round(i * step)), size) for i in range(count)]
+
+def suppress_cut_boxes(detections, tile_ids, cut, coverage_threshold=0.6):
+    """Drop boxes cut by an interior tile border that another tile saw whole
+
+    A cut box is removed when a box from a different tile covers most of it
+    (intersection / cut box area) and that box is either uncut or larger.
+    Boxes inside the same tile never suppress each other, so overlapping
+    people detected in one tile are left to ordinary NMS.
+    """
+    candidates = np.flatnonzero(cut)
+    if not len(candidates) or len(detections) <= 1:
+        return detections
+
+    boxes = detections[:, :4]
+    areas = np.maximum(boxes[:, 2], 0) * np.maximum(boxes[:, 3], 0)
+    a = boxes[candidates]
+    inter_w = np.clip(np.minimum(a[:, 0:1] + a[:, 2:3], boxes[:, 0] + boxes[:, 2])
+                      - np.maximum(a[:, 0:1], boxes[:, 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[:, 1:2] + a[:, 3:4], boxes[:, 1] + boxes[:, 3])
+                      - np.maximum(a[:, 1:2], boxes[:, 1]), 0, None)
+    coverage = inter_w * inter_h / np.maximum(areas[candidates][:, None], 1e-6)
+
+    other_tile = tile_ids[candidates][:, None] != tile_ids[None, :]
+    better = ~cut[None, :] | (areas[None, :] > areas[candidates][:, None])
+    covered = ((coverage >= coverage_threshold) & other_tile & better).any(axis=1)
+
+    keep = np.ones(len(detections), dtype=bool)
+    keep[candidates[covered]] = False
+    return detections[keep]
+
+def nms(detections, iou_threshold=0.45):
+    """Greedy IoU non-maximum suppression over an (N, 5) detection array"""
+    if len(detections) <= 1:
+        return detections
+
+    areas = np.maximum(detections[:, 2], 0) * np.maximum(detections[:, 3], 0)
+    order = np.argsort(-detections[:, 4], kind="stable")
+    detections, areas = detections[order], areas[order]
+    x1, y1 = detections[:, 0], detections[:, 1]
+    x2, y2 = x1 + detections[:, 2], y1 + detections[:, 3]
+
+    keep = []
+    remaining = np.arange(len(detections))
+    while len(remaining):
+        best, rest = remaining[0], remaining[1:]
+        keep.append(best)
+
+        # IoU of the best box against all remaining ones at once
+        inter_w = np.clip(np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]), 0, None)
+        inter_h = np.clip(np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]), 0, None)
+        inter = inter_w * inter_h
+        iou = inter / np.maximum(areas[best] + areas[rest] - inter, 1e-6)
+        remaining = rest[iou <= iou_threshold]
+
+    return detections[keep]
+
 class SimpleFaceDetector:
     """Simple face detector with fallback options"""
-    def __init__(self):
-        self.logger = SimpleLogger()
+    # Frames --detector auto benchmarks the candidates on
+    AUTO_SAMPLE_FRAMES = 5
+
+    def __init__(self, max_batch_size=8, max_batch_wait=0.01, yolo_classes=(0,), conf_threshold=0.5,
+                 backend="torch", onnx_model=None, calibration_dir=None,
+                 detector="default", accuracy_floor=0.7, cache_path=DETECTOR_CACHE, load_async=False,
+                 tiles=None, tile_overlap=0.2, logger=None):
+        self.logger = logger or get_logger()
+
+        # Batching limits for detect_faces_batch (frames per model call, seconds to wait for a full batch)
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_batch_wait = max_batch_wait
+
+        # YOLO class ids kept after decoding (0 = person for COCO weights, face for face-trained weights)
+        self.yolo_classes = np.array(sorted(yolo_classes), dtype=np.float32) if yolo_classes else None
+        self.conf_threshold = conf_threshold
+
+        # YOLO backend settings
+        self.backend = backend
+        self.onnx_model = onnx_model
+        self.calibration_dir = calibration_dir
+
+        # Auto selection settings
+        self.accuracy_floor = accuracy_floor
+        self.cache_path = cache_path
+
+        # Tiled detection for high-resolution frames: (cols, rows) and overlap fraction
+        self.tiles = tiles
+        self.tile_overlap = tile_overlap
+        self._tile_layouts = {}
+
+        # Speed/quality knobs (adjusted at runtime by LatencyController)
+        self.input_scale = 1.0  # Frames are downscaled by this factor before detection (Haar, YuNet)
+        self.yolo_imgsz = 640  # YOLO inference size (torch backend)
+        self.haar_scale_factor = 1.1
+
+        # Set once the model is loaded and warmed up
+        self.ready = threading.Event()
+        self.face_cascade = None
+
+        if detector == "auto":
+            # Benchmarked at the real input resolution, so wait for the first frames
+            self.detector_type = "auto"
+            self.auto_samples = []
+            self.logger.log(f"Detector will be selected after {self.AUTO_SAMPLE_FRAMES} frames (--detector auto)")
+            self.ready.set()
+        elif load_async:
+            # Load and warm up in the background while the capture opens
+            self.detector_type = "loading"
+            threading.Thread(target=self._load, args=(detector,), name="DetectorLoader", daemon=True).start()
+        else:
+            self._load(detector)
+
+    def _load(self, detector):
+        """Initialize the detector and run one warm-up inference"""
+        try:
+            self._init_detector(detector)
+            with STARTUP.measure("detector warm-up"):
+                warmup_frame = np.zeros((480, 640, 3), dtype=np.uint8)
+                if self.detector_type == "yolo":
+                    self._detect_yolo(warmup_frame)
+                elif self.detector_type == "onnx":
+                    self.model.detect(warmup_frame)
+        except Exception as e:
+            self.logger.error(f"Detector loading failed: {e}")
+            self._init_opencv_detector()
+        finally:
+            self.ready.set()
+
+    def wait_ready(self, timeout=None):
+        """Block until background model loading has finished"""
+        return self.ready.wait(timeout)
+
+    def _init_detector(self, name):
+        """Initialize a detector from the registry ("default" = YOLO if available, else Haar)"""
+        if name == "default":
+            name = "yolo" if self._is_available("yolo") else "haar"
+        if name not in DETECTOR_REGISTRY:
+            raise ValueError(f"Unknown detector: {name}")
+        getattr(self, DETECTOR_REGISTRY[name]["init"])()
+
+    def _is_available(self, name):
+        """Check whether a registered detector can run on this machine"""
+        if name == "yolo":
+            if self.backend == "onnxruntime":
+                return ONNXRUNTIME_AVAILABLE and (YOLO_AVAILABLE or os.path.exists(self.onnx_model or DEFAULT_ONNX_MODEL))
+            if self.backend == "openvino":
+                return OPENVINO_AVAILABLE and (YOLO_AVAILABLE or os.path.exists(self.onnx_model or DEFAULT_ONNX_MODEL))
+            return YOLO_AVAILABLE
+        if name == "yunet":
+            return hasattr(cv2, "FaceDetectorYN") and os.path.exists(YUNET_MODEL)
+        if name == "ssd":
+            return os.path.exists(SSD_PROTOTXT) and os.path.exists(SSD_MODEL)
+        return name == "haar"
+
+    def _init_yolo_detector(self):
+        """Initialize YOLOv8 on the configured backend"""
+        # Exported model on a CPU engine (never imports torch)
+        if self.backend in OnnxYoloBackend.ENGINES:
+            self._init_onnx_detector(self.backend, self.onnx_model, self.calibration_dir)
 
         # Try YOLOv8 first
-        if YOLO_AVAILABLE:
+        elif YOLO_AVAILABLE:
             try:
+                with STARTUP.measure("import ultralytics/torch"):
+                    from ultralytics import YOLO
+
                 # Use a lightweight YOLO model
-                self.model = YOLO('yolov8n.pt')  # Will auto-download
+                with STARTUP.measure("model load"):
+                    self.model = YOLO(DEFAULT_YOLO_WEIGHTS)  # Will auto-download
                 self.detector_type = "yolo"
                 self.logger.log("Using YOLOv8 for face detection")
             except Exception as e:
-                self.logger.log(f"YOLO failed: {e}, falling back to OpenCV")
+                self.logger.warning(f"YOLO failed: {e}, falling back to OpenCV")
                 self._init_opencv_detector()
         else:
             self._init_opencv_detector()
 
+    def _init_yunet_detector(self):
+        """Initialize OpenCV's YuNet face detector"""
+        try:
+            self.yunet = cv2.FaceDetectorYN.create(YUNET_MODEL, "", (320, 320), self.conf_threshold)
+            self.yunet_size = None
+            self.detector_type = "yunet"
+            self.logger.log("Using OpenCV YuNet for face detection")
+        except Exception as e:
+            self.logger.warning(f"YuNet failed: {e}, falling back to OpenCV")
+            self._init_opencv_detector()
+
+    def _init_ssd_detector(self):
+        """Initialize the OpenCV DNN res10 SSD face detector"""
+        try:
+            self.ssd = cv2.dnn.readNetFromCaffe(SSD_PROTOTXT, SSD_MODEL)
+            self.detector_type = "ssd"
+            self.logger.log("Using OpenCV res10 SSD for face detection")
+        except Exception as e:
+            self.logger.warning(f"SSD failed: {e}, falling back to OpenCV")
+            self._init_opencv_detector()
+
+    def _cache_key(self, frame):
+        """Key for the cached auto choice: machine, OpenCV build, resolution and floor"""
+        height, width = frame.shape[:2]
+        return "|".join([
+            platform.node(), platform.machine(), platform.processor() or "-",
+            cv2.__version__, self.backend, f"{width}x{height}", f"{self.accuracy_floor:.2f}"
+        ])
+
+    def _load_cache(self):
+        """Read cached auto choices"""
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def select_detector(self, sample_frames, runs=3):
+        """Pick the fastest available detector that meets the accuracy floor
+
+        Each candidate is timed on the sample frames (the real input
+        resolution). The choice is cached per machine/resolution so later
+        startups skip the benchmark.
+        """
+        key = self._cache_key(sample_frames[0])
+        cache = self._load_cache()
+        cached = cache.get(key)
+        if cached and self._is_available(cached["detector"]):
+            self.logger.log(f"Auto detector: using cached choice {cached['detector']}")
+            self._init_detector(cached["detector"])
+            return cached["detector"]
+
+        timings = {}
+        for name, entry in DETECTOR_REGISTRY.items():
+            if entry["accuracy"] < self.accuracy_floor or not self._is_available(name):
+                continue
+
+            candidate = SimpleFaceDetector(
+                conf_threshold=self.conf_threshold, backend=self.backend,
+                onnx_model=self.onnx_model, calibration_dir=self.calibration_dir, detector=name
+            )
+            candidate.yolo_classes = self.yolo_classes
+            if candidate.detector_type in ("opencv", "none") and name != "haar":
+                continue  # Failed to load and fell back
+
+            candidate.detect_faces(sample_frames[0])  # Warm-up
+            start = time.perf_counter()
+            for _ in range(runs):
+                for frame in sample_frames:
+                    candidate.detect_faces(frame)
+            timings[name] = (time.perf_counter() - start) / (runs * len(sample_frames))
+            self.logger.log(f"Auto detector: {name} {timings[name] * 1000:.1f} ms/frame")
+
+        # Nothing meets the floor: fall back to the most accurate available detector
+        if timings:
+            choice = min(timings, key=timings.get)
+        else:
+            available = [name for name in DETECTOR_REGISTRY if self._is_available(name)]
+            choice = max(available, key=lambda name: DETECTOR_REGISTRY[name]["accuracy"])
+            self.logger.log(f"Auto detector: nothing meets accuracy floor {self.accuracy_floor}")
+
+        self.logger.log(f"Auto detector: selected {choice}")
+        self._init_detector(choice)
+
+        cache[key] = {"detector": choice, "ms_per_frame": {k: round(v * 1000, 2) for k, v in timings.items()}}
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            with open(self.cache_path, "w") as f:
+                json.dump(cache, f, indent=2)
+        except OSError as e:
+            self.logger.error(f"Could not save detector choice: {e}")
+        return choice
+
+    def _init_onnx_detector(self, engine, onnx_model, calibration_dir):
+        """Initialize an ONNX Runtime / OpenVINO detector, exporting the model on first use"""
+        try:
+            model_path = onnx_model or DEFAULT_ONNX_MODEL
+            if calibration_dir and not onnx_model:
+                model_path = quantized_model_path(model_path)
+
+            if not os.path.exists(model_path):
+                self.logger.log(f"{model_path} not found, building it from {DEFAULT_YOLO_WEIGHTS} (one-time)")
+                model_path = export_onnx_model(
+                    onnx_path=onnx_model or DEFAULT_ONNX_MODEL,
+                    calibration_dir=calibration_dir,
+                    logger=self.logger
+                )
+
+            classes = self.yolo_classes.astype(np.int64) if self.yolo_classes is not None else None
+            with STARTUP.measure("model load"):
+                self.model = OnnxYoloBackend(model_path, engine=engine,
+                                             conf_threshold=self.conf_threshold, classes=classes)
+            self.detector_type = "onnx"
+            self.logger.log(f"Using {engine} ({model_path}) for face detection")
+        except Exception as e:
+            self.logger.warning(f"{engine} backend failed: {e}, falling back to OpenCV")
+            self._init_opencv_detector()
+
     def _init_opencv_detector(self):
         """Initialize OpenCV face detector as fallback"""
         try:
@@ -87,261 +909,1659 @@ class SimpleFaceDetector:
             self.detector_type = "opencv"
             self.logger.log("Using OpenCV Haar Cascade for face detection")
         except Exception as e:
-            self.logger.log(f"OpenCV detector failed: {e}")
+            self.logger.error(f"OpenCV detector failed: {e}")
             self.detector_type = "none"
 
-    def detect_faces(self, frame):
-        """Detect faces in frame, return list of (x, y, w, h, confidence)"""
+    @staticmethod
+    def to_list(detections):
+        """Convert an (N, 5) detection array to a list of (x, y, w, h, confidence)"""
+        return [(int(x), int(y), int(w), int(h), float(conf)) for x, y, w, h, conf in detections.tolist()]
+
+    def detect_faces(self, frame, as_array=False):
+        """Detect faces in frame, return list of (x, y, w, h, confidence)
+
+        With as_array=True an (N, 5) float32 array with the same columns is returned.
+        """
+        if not self.ready.is_set():
+            self.ready.wait()
+        self._select_if_auto([frame])
+
+        if self.tiles:
+            detections = self._detect_tiled([frame])[0]
+        else:
+            detections = self._detect_single(frame)
+        return detections if as_array else self.to_list(detections)
+
+    def _select_if_auto(self, frames):
+        """Run the --detector auto selection once AUTO_SAMPLE_FRAMES frames were seen
+
+        Until then copies of the frames are kept as benchmark samples and
+        detection runs on the Haar cascade. A cached choice is used at once.
+        """
+        if self.detector_type != "auto":
+            return
+        if not self.auto_samples and self._cache_key(frames[0]) in self._load_cache():
+            self.auto_samples = [frames[0]]
+        else:
+            needed = self.AUTO_SAMPLE_FRAMES - len(self.auto_samples)
+            self.auto_samples.extend(frame.copy() for frame in frames[:needed])
+            if len(self.auto_samples) < self.AUTO_SAMPLE_FRAMES:
+                if self.face_cascade is None:
+                    self.face_cascade = cv2.CascadeClassifier(
+                        cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+                    )
+                return
+
+        try:
+            self.select_detector(self.auto_samples)
+        except Exception as e:
+            self.logger.error(f"Auto detector selection failed: {e}")
+            self._init_opencv_detector()
+        self.auto_samples = []
+
+    def _detect_single(self, frame):
+        """Run the active detector on one frame, return an (N, 5) array"""
         try:
+            scale = self.input_scale
+            if scale != 1.0:
+                frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
             if self.detector_type == "yolo":
-                return self._detect_yolo(frame)
-            elif self.detector_type == "opencv":
-                return self._detect_opencv(frame)
+                detections = self._detect_yolo(frame)
+            elif self.detector_type == "onnx":
+                detections = self.model.detect(frame)
+            elif self.detector_type == "yunet":
+                detections = self._detect_yunet(frame)
+            elif self.detector_type == "ssd":
+                detections = self._detect_ssd(frame)
+            elif self.detector_type in ("opencv", "auto"):
+                detections = self._detect_opencv(frame)  # "auto": Haar while sampling frames
             else:
-                return []
+                detections = EMPTY_DETECTIONS
+
+            if scale != 1.0 and len(detections):
+                detections = self._unscale(detections, scale)
+            return detections
         except Exception as e:
-            self.logger.log(f"Face detection error: {e}")
+            self.logger.error(f"Face detection error: {e}", key="detect")
+            return EMPTY_DETECTIONS
+
+    @staticmethod
+    def _unscale(detections, scale):
+        """Map boxes detected on a downscaled frame back to full resolution"""
+        detections = detections.copy()
+        detections[:, :4] /= scale
+        return detections
+
+    def detect_faces_batch(self, frames, as_array=False):
+        """Detect faces in several frames, return one detection list per frame
+
+        YOLO frames are sent through the model max_batch_size at a time in a
+        single call; other detectors fall back to frame-by-frame detection.
+        """
+        if not frames:
             return []
+        if not self.ready.is_set():
+            self.ready.wait()
+        self._select_if_auto(frames)
+
+        if self.tiles:
+            detections = self._detect_tiled(frames)
+        else:
+            detections = self._detect_many(frames)
+
+        if as_array:
+            return detections
+        return [self.to_list(frame_detections) for frame_detections in detections]
+
+    def _detect_many(self, frames):
+        """Run the active detector on several frames (one YOLO call per batch)"""
+        if self.detector_type != "yolo":
+            return [self._detect_single(frame) for frame in frames]
+
+        scale = self.input_scale
+        if scale != 1.0:
+            frames = [cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) for frame in frames]
+
+        detections = []
+        for start in range(0, len(frames), self.max_batch_size):
+            chunk = frames[start:start + self.max_batch_size]
+            try:
+                detections.extend(self._detect_yolo_batch(chunk))
+            except Exception as e:
+                self.logger.error(f"YOLO batch detection error: {e}", key="detect.yolo_batch")
+                detections.extend(EMPTY_DETECTIONS for _ in chunk)
+
+        if scale != 1.0:
+            detections = [self._unscale(d, scale) if len(d) else d for d in detections]
+        return detections
+
+    def tile_layout(self, frame_shape):
+        """Overlapping tiles (x, y, w, h) covering a frame, computed once per resolution"""
+        key = tuple(frame_shape[:2])
+        layout = self._tile_layouts.get(key)
+        if layout is None:
+            frame_h, frame_w = key
+            cols, rows = self.tiles
+            xs = _tile_spans(frame_w, cols, self.tile_overlap)
+            ys = _tile_spans(frame_h, rows, self.tile_overlap)
+            layout = [(x, y, w, h) for (y, h) in ys for (x, w) in xs]
+            self._tile_layouts[key] = layout
+        return layout
+
+    # Boxes within this many pixels of an interior tile border count as cut
+    TILE_CUT_MARGIN = 2
+
+    def _detect_tiled(self, frames):
+        """Detect on overlapping tiles of each frame (all tiles in one batch) and merge
+
+        Boxes touching an interior tile border are dropped when another tile
+        saw the face whole; the rest are merged with IoU NMS.
+        """
+        crops, owners = [], []
+        for index, frame in enumerate(frames):
+            frame_h, frame_w = frame.shape[:2]
+            for tile_id, (x, y, w, h) in enumerate(self.tile_layout(frame.shape)):
+                crops.append(frame[y:y + h, x:x + w])  # View, no copy
+                owners.append((index, tile_id, x, y, w, h, frame_w, frame_h))
+
+        parts = [[] for _ in frames]
+        margin = self.TILE_CUT_MARGIN
+        for (index, tile_id, x, y, w, h, frame_w, frame_h), found in zip(owners, self._detect_many(crops)):
+            if not len(found):
+                continue
+            # Only borders inside the frame cut faces
+            cut = np.zeros(len(found), dtype=bool)
+            if x > 0:
+                cut |= found[:, 0] <= margin
+            if y > 0:
+                cut |= found[:, 1] <= margin
+            if x + w < frame_w:
+                cut |= found[:, 0] + found[:, 2] >= w - margin
+            if y + h < frame_h:
+                cut |= found[:, 1] + found[:, 3] >= h - margin
+            parts[index].append((found + np.array([x, y, 0, 0, 0], dtype=np.float32),
+                                 np.full(len(found), tile_id), cut))
+
+        merged = []
+        for found in parts:
+            if not found:
+                merged.append(EMPTY_DETECTIONS)
+                continue
+            detections, tile_ids, cut = (np.concatenate(column) for column in zip(*found))
+            merged.append(nms(suppress_cut_boxes(detections, tile_ids, cut)))
+        return merged
+
+    def detect_faces_in_regions(self, frame, regions, as_array=False):
+        """Detect faces only inside regions (x, y, w, h), boxes mapped back to frame coordinates
+
+        Crops are NumPy views of the frame, so no pixels are copied.
+        """
+        parts = []
+        for (x, y, w, h) in regions:
+            crop = frame[y:y + h, x:x + w]
+            if crop.size == 0:
+                continue
+            found = self.detect_faces(crop, as_array=True)
+            if len(found):
+                found = found + np.array([x, y, 0, 0, 0], dtype=np.float32)
+                parts.append(found)
+
+        detections = np.vstack(parts) if parts else EMPTY_DETECTIONS
+        return detections if as_array else self.to_list(detections)
 
     def _detect_yolo(self, frame):
         """YOLO-based detection"""
         try:
-            results = self.model(frame, conf=0.5, verbose=False)
-            faces = []
-
-            if results and len(results) > 0:
-                boxes = results[0].boxes
-                if boxes is not None:
-                    for box in boxes:
-                        # Get coordinates and confidence
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        conf = box.conf[0].cpu().numpy()
-
-                        # Convert to (x, y, w, h) format
-                        x, y, w, h = int(x1), int(y1), int(x2-x1), int(y2-y1)
-                        faces.append((x, y, w, h, float(conf)))
-
-            return faces
+            return self._detect_yolo_batch([frame])[0]
         except Exception as e:
-            self.logger.log(f"YOLO detection error: {e}")
-            return []
+            self.logger.error(f"YOLO detection error: {e}", key="detect.yolo")
+            return EMPTY_DETECTIONS
+
+    def _detect_yolo_batch(self, frames):
+        """Run YOLO once over a list of frames"""
+        results = self.model(list(frames), conf=self.conf_threshold, imgsz=self.yolo_imgsz, verbose=False)
+        detections = [self._decode_yolo_result(result) for result in results]
+
+        # Keep one entry per input frame even if the model returned fewer results
+        while len(detections) < len(frames):
+            detections.append(EMPTY_DETECTIONS)
+        return detections
+
+    def _decode_yolo_result(self, result):
+        """Convert one YOLO result to an (N, 5) float32 array of (x, y, w, h, confidence)"""
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return EMPTY_DETECTIONS
+
+        # Single device-to-host transfer, columns: x1, y1, x2, y2, conf, cls
+        data = boxes.data.cpu().numpy()
+        xyxy, conf, cls = data[:, :4], data[:, -2], data[:, -1]
+
+        # Drop classes we don't track (chairs, bags, ...)
+        if self.yolo_classes is not None:
+            keep = np.isin(cls, self.yolo_classes)
+            xyxy, conf = xyxy[keep], conf[keep]
+
+        # Convert to (x, y, w, h) format
+        detections = np.empty((len(conf), 5), dtype=np.float32)
+        detections[:, :2] = xyxy[:, :2]
+        detections[:, 2:4] = xyxy[:, 2:4] - xyxy[:, :2]
+        detections[:, 4] = conf
+        return detections
+
+    def _detect_yunet(self, frame):
+        """YuNet-based detection"""
+        height, width = frame.shape[:2]
+        if self.yunet_size != (width, height):
+            self.yunet.setInputSize((width, height))
+            self.yunet_size = (width, height)
+
+        _, faces = self.yunet.detect(frame)
+        if faces is None or len(faces) == 0:
+            return EMPTY_DETECTIONS
+
+        # Rows: x, y, w, h, 5 landmark points, score
+        return np.ascontiguousarray(faces[:, [0, 1, 2, 3, 14]], dtype=np.float32)
+
+    def _detect_ssd(self, frame):
+        """res10 SSD-based detection"""
+        height, width = frame.shape[:2]
+        blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
+        self.ssd.setInput(blob)
+
+        # Rows: image_id, label, confidence, x1, y1, x2, y2 (normalized)
+        out = self.ssd.forward()[0, 0]
+        out = out[out[:, 2] >= self.conf_threshold]
+        if len(out) == 0:
+            return EMPTY_DETECTIONS
+
+        scale = np.array([width, height, width, height], dtype=np.float32)
+        xyxy = out[:, 3:7] * scale
+        detections = np.empty((len(out), 5), dtype=np.float32)
+        detections[:, :2] = xyxy[:, :2]
+        detections[:, 2:4] = xyxy[:, 2:4] - xyxy[:, :2]
+        detections[:, 4] = out[:, 2]
+        return detections
 
     def _detect_opencv(self, frame):
         """OpenCV-based detection"""
         try:
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
             faces_rect = self.face_cascade.detectMultiScale(
-                gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
+                gray, scaleFactor=self.haar_scale_factor, minNeighbors=5, minSize=(30, 30)
             )
+            if len(faces_rect) == 0:
+                return EMPTY_DETECTIONS
 
-            faces = []
-            for (x, y, w, h) in faces_rect:
-                faces.append((x, y, w, h, 0.8))  # Assign default confidence
-
-            return faces
+            detections = np.empty((len(faces_rect), 5), dtype=np.float32)
+            detections[:, :4] = faces_rect
+            detections[:, 4] = 0.8  # Assign default confidence
+            return detections
         except Exception as e:
-            self.logger.log(f"OpenCV detection error: {e}")
-            return []
+            self.logger.error(f"OpenCV detection error: {e}", key="detect.opencv")
+            return EMPTY_DETECTIONS
+
+def _letterbox_layout(frame_shape, input_size):
+    """Scale and padding that fit a frame into the model input (ultralytics-style letterbox)"""
+    frame_h, frame_w = frame_shape[:2]
+    input_h, input_w = input_size
+    scale = min(input_h / frame_h, input_w / frame_w)
+    new_w, new_h = int(round(frame_w * scale)), int(round(frame_h * scale))
+    pad_x, pad_y = (input_w - new_w) // 2, (input_h - new_h) // 2
+    return scale, pad_x, pad_y, new_w, new_h
+
+def _letterbox_tensor(frame, input_size, canvas, out):
+    """Letterbox a BGR frame into canvas and write the RGB NCHW float tensor into out"""
+    scale, pad_x, pad_y, new_w, new_h = _letterbox_layout(frame.shape, input_size)
+    canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(
+        frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR
+    )
+    np.multiply(canvas[..., ::-1].transpose(2, 0, 1), 1.0 / 255.0, out=out, casting='unsafe')
+    return scale, pad_x, pad_y
+
+class OnnxYoloBackend:
+    """YOLOv8 ONNX model on a CPU engine (onnxruntime or OpenVINO), no torch import"""
+    ENGINES = ("onnxruntime", "openvino")
+
+    def __init__(self, model_path, engine="onnxruntime", conf_threshold=0.5,
+                 iou_threshold=0.45, classes=None):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown inference engine: {engine}")
+
+        self.engine = engine
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.classes = classes
+
+        if engine == "openvino":
+            with STARTUP.measure("import openvino"):
+                import openvino as ov
+
+            compiled = ov.Core().compile_model(model_path, "CPU")
+            self.request = compiled.create_infer_request()
+            input_shape = list(compiled.input(0).shape)
+        else:
+            with STARTUP.measure("import onnxruntime"):
+                import onnxruntime as ort
+
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+            model_input = self.session.get_inputs()[0]
+            self.input_name = model_input.name
+            input_shape = model_input.shape
+
+        # Static export: (1, 3, H, W); dynamic axes fall back to 640
+        self.input_size = tuple(d if isinstance(d, int) else 640 for d in input_shape[2:4])
+
+        # Preallocated input tensor and letterbox canvas, reused every frame
+        self.input_tensor = np.zeros((1, 3) + self.input_size, dtype=np.float32)
+        self.canvas = np.full(self.input_size + (3,), 114, dtype=np.uint8)
+        self.frame_shape = None
+
+    def _infer(self):
+        """Run the model on the preallocated input tensor"""
+        if self.engine == "openvino":
+            self.request.infer({0: self.input_tensor})
+            return self.request.get_output_tensor(0).data
+        return self.session.run(None, {self.input_name: self.input_tensor})[0]
+
+    def detect(self, frame):
+        """Detect objects in a BGR frame, return an (N, 5) float32 array of (x, y, w, h, confidence)"""
+        # Borders only need repainting when the input resolution changes
+        if frame.shape != self.frame_shape:
+            self.canvas.fill(114)
+            self.frame_shape = frame.shape
+
+        scale, pad_x, pad_y = _letterbox_tensor(frame, self.input_size, self.canvas, self.input_tensor[0])
+        return self._decode(self._infer(), scale, pad_x, pad_y)
+
+    def _decode(self, output, scale, pad_x, pad_y):
+        """Decode raw YOLOv8 output (1, 4 + classes, anchors) with NMS"""
+        preds = output[0].T  # (anchors, 4 + classes), boxes as cx, cy, w, h
+        class_scores = preds[:, 4:]
+        cls = class_scores.argmax(axis=1)
+        conf = class_scores[np.arange(len(cls)), cls]
+
+        keep = conf >= self.conf_threshold
+        if self.classes is not None:
+            keep &= np.isin(cls, self.classes)
+        if not keep.any():
+            return EMPTY_DETECTIONS
+
+        boxes = preds[keep, :4]
+        conf = conf[keep]
+
+        # Undo letterbox and convert to (x, y, w, h)
+        xywh = np.empty((len(conf), 4), dtype=np.float32)
+        xywh[:, 0] = (boxes[:, 0] - boxes[:, 2] / 2 - pad_x) / scale
+        xywh[:, 1] = (boxes[:, 1] - boxes[:, 3] / 2 - pad_y) / scale
+        xywh[:, 2:] = boxes[:, 2:] / scale
+
+        indices = cv2.dnn.NMSBoxes(xywh.tolist(), conf.tolist(), self.conf_threshold, self.iou_threshold)
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+
+        detections = np.empty((len(indices), 5), dtype=np.float32)
+        detections[:, :4] = xywh[indices]
+        detections[:, 4] = conf[indices]
+        return detections
+
+def quantized_model_path(onnx_path):
+    """Path of the int8 variant of an ONNX model"""
+    root, ext = os.path.splitext(onnx_path)
+    return f"{root}.int8{ext}"
+
+def export_onnx_model(weights=DEFAULT_YOLO_WEIGHTS, onnx_path=DEFAULT_ONNX_MODEL, imgsz=640,
+                      calibration_dir=None, logger=None):
+    """Convert YOLO weights to ONNX once, optionally int8 static-quantized
+
+    Quantization calibrates activations on the images in calibration_dir.
+    Returns the path of the model to load. This is the only place the ONNX
+    backends need ultralytics/torch.
+    """
+    log = logger.log if logger else print
+    os.makedirs(os.path.dirname(onnx_path) or ".", exist_ok=True)
+
+    if not os.path.exists(onnx_path):
+        from ultralytics import YOLO
+
+        exported = YOLO(weights).export(format="onnx", imgsz=imgsz, dynamic=False, simplify=True)
+        os.replace(exported, onnx_path)
+        log(f"Exported {weights} to {onnx_path}")
+
+    if not calibration_dir:
+        return onnx_path
+
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    class FrameCalibrationReader(CalibrationDataReader):
+        """Feed letterboxed calibration frames to the quantizer"""
+        def __init__(self, image_dir, input_name, input_size, max_images=200):
+            self.paths = sorted(
+                os.path.join(image_dir, name) for name in os.listdir(image_dir)
+                if name.lower().endswith((".jpg", ".jpeg", ".png", ".bmp"))
+            )[:max_images]
+            self.input_name = input_name
+            self.input_size = input_size
+            self.index = 0
+
+        def get_next(self):
+            while self.index < len(self.paths):
+                frame = cv2.imread(self.paths[self.index])
+                self.index += 1
+                if frame is None:
+                    continue
+                canvas = np.full(self.input_size + (3,), 114, dtype=np.uint8)
+                tensor = np.empty((1, 3) + self.input_size, dtype=np.float32)
+                _letterbox_tensor(frame, self.input_size, canvas, tensor[0])
+                return {self.input_name: tensor}
+            return None
+
+    import onnxruntime as ort
+
+    session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+    model_input = session.get_inputs()[0]
+    input_size = tuple(d if isinstance(d, int) else imgsz for d in model_input.shape[2:4])
+    reader = FrameCalibrationReader(calibration_dir, model_input.name, input_size)
+    if not reader.paths:
+        raise ValueError(f"No calibration images found in {calibration_dir}")
+
+    int8_path = quantized_model_path(onnx_path)
+    quantize_static(onnx_path, int8_path, reader,
+                    quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8)
+    log(f"Quantized {onnx_path} to int8 with {len(reader.paths)} calibration frames: {int8_path}")
+    return int8_path
+
+# Cost for pairs ruled out by gating (large but finite so the solver always succeeds)
+GATED_COST = 1e6
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU between (N, 4) and (M, 4) arrays of (x, y, w, h)"""
+    ax1, ay1 = boxes_a[:, 0:1], boxes_a[:, 1:2]
+    ax2, ay2 = ax1 + boxes_a[:, 2:3], ay1 + boxes_a[:, 3:4]
+    bx1, by1 = boxes_b[:, 0], boxes_b[:, 1]
+    bx2, by2 = bx1 + boxes_b[:, 2], by1 + boxes_b[:, 3]
+
+    inter_w = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None)
+    inter_h = np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    inter = inter_w * inter_h
+    union = boxes_a[:, 2:3] * boxes_a[:, 3:4] + boxes_b[:, 2] * boxes_b[:, 3] - inter
+    return inter / np.maximum(union, 1e-6)
+
+def _greedy_assignment(cost):
+    """Cheapest-pair-first assignment, used when SciPy isn't installed"""
+    order = np.argsort(cost, axis=None)
+    rows, cols = np.unravel_index(order, cost.shape)
+    used_rows, used_cols = set(), set()
+    matched_rows, matched_cols = [], []
+    for row, col in zip(rows.tolist(), cols.tolist()):
+        if row in used_rows or col in used_cols:
+            continue
+        used_rows.add(row)
+        used_cols.add(col)
+        matched_rows.append(row)
+        matched_cols.append(col)
+    return np.array(matched_rows, dtype=np.int64), np.array(matched_cols, dtype=np.int64)
+
+_LINEAR_SUM_ASSIGNMENT = None
+
+def linear_assignment(cost):
+    """Optimal (Hungarian) assignment for a cost matrix, returns (rows, cols)
+
+    SciPy is imported on first use; without it a greedy match is used.
+    """
+    global _LINEAR_SUM_ASSIGNMENT
+    if _LINEAR_SUM_ASSIGNMENT is None:
+        try:
+            from scipy.optimize import linear_sum_assignment
+            _LINEAR_SUM_ASSIGNMENT = linear_sum_assignment
+        except ImportError:
+            _LINEAR_SUM_ASSIGNMENT = _greedy_assignment
+    return _LINEAR_SUM_ASSIGNMENT(cost)
+
+def _box_centers(boxes):
+    """(N, 2) centers of (N, 4) boxes (x, y, w, h)"""
+    return boxes[:, :2] + boxes[:, 2:4] / 2.0
+
+def pairwise_iou(boxes_a, boxes_b):
+    """IoU of row-aligned (K, 4) box pairs"""
+    inter_w = np.clip(np.minimum(boxes_a[:, 0] + boxes_a[:, 2], boxes_b[:, 0] + boxes_b[:, 2])
+                      - np.maximum(boxes_a[:, 0], boxes_b[:, 0]), 0, None)
+    inter_h = np.clip(np.minimum(boxes_a[:, 1] + boxes_a[:, 3], boxes_b[:, 1] + boxes_b[:, 3])
+                      - np.maximum(boxes_a[:, 1], boxes_b[:, 1]), 0, None)
+    inter = inter_w * inter_h
+    union = boxes_a[:, 2] * boxes_a[:, 3] + boxes_b[:, 2] * boxes_b[:, 3] - inter
+    return inter / np.maximum(union, 1e-6)
+
+def grid_candidate_pairs(boxes_a, boxes_b, max_distance):
+    """Candidate (rows, cols) pairs from a uniform grid over the box centers
+
+    The cell size is at least max_distance and the largest box side, so every
+    pair that is within max_distance or overlaps has its centers in the same
+    or a neighboring cell. Only those 3x3 neighborhoods are searched.
+    """
+    empty = np.empty(0, dtype=np.int64)
+    if not len(boxes_a) or not len(boxes_b):
+        return empty, empty
+
+    cell = max(float(max_distance), float(boxes_a[:, 2:4].max()), float(boxes_b[:, 2:4].max()), 1.0)
+    cells_a = np.floor(_box_centers(boxes_a) / cell).astype(np.int64)
+    cells_b = np.floor(_box_centers(boxes_b) / cell).astype(np.int64)
+
+    # One integer key per cell (rows shifted so keys are non-negative with a spare cell each side)
+    low = np.minimum(cells_a.min(axis=0), cells_b.min(axis=0)) - 1
+    height = max(cells_a[:, 1].max(), cells_b[:, 1].max()) - low[1] + 2
+    keys_b = (cells_b[:, 0] - low[0]) * height + (cells_b[:, 1] - low[1])
+    order = np.argsort(keys_b, kind="stable")
+    sorted_keys = keys_b[order]
+
+    rows, cols = [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            keys_a = (cells_a[:, 0] + dx - low[0]) * height + (cells_a[:, 1] + dy - low[1])
+            start = np.searchsorted(sorted_keys, keys_a, side="left")
+            counts = np.searchsorted(sorted_keys, keys_a, side="right") - start
+            if not counts.any():
+                continue
+            # Expand each [start, start + count) range into explicit pairs
+            pair_rows = np.repeat(np.arange(len(boxes_a)), counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            rows.append(pair_rows)
+            cols.append(order[np.repeat(start, counts) + offsets])
+    if not rows:
+        return empty, empty
+    return np.concatenate(rows), np.concatenate(cols)
+
+def _pair_components(rows, cols, n_rows):
+    """Connected-component label per candidate pair of a bipartite graph"""
+    nodes_b = cols + n_rows
+    labels = np.arange(n_rows + int(cols.max()) + 1)
+    while True:
+        # Propagate the smaller label along every edge, then jump pointers
+        low = np.minimum(labels[rows], labels[nodes_b])
+        updated = labels.copy()
+        np.minimum.at(updated, rows, low)
+        np.minimum.at(updated, nodes_b, low)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels[rows]
+        labels = updated
+
+def sparse_assignment(rows, cols, costs, n_rows):
+    """Optimal assignment over a sparse (COO) cost, returns matched (rows, cols)
+
+    Pairs missing from the sparse cost are never matched. The graph is split
+    into connected components; isolated pairs are matched directly and only
+    the remaining (small) components go through linear_assignment.
+    """
+    if not len(rows):
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    components = _pair_components(rows, cols, n_rows)
+    order = np.argsort(components, kind="stable")
+    rows, cols, costs, components = rows[order], cols[order], costs[order], components[order]
+    _, starts, sizes = np.unique(components, return_index=True, return_counts=True)
+
+    single = starts[sizes == 1]
+    matched_rows, matched_cols = [rows[single]], [cols[single]]
+    for start, size in zip(starts[sizes > 1].tolist(), sizes[sizes > 1].tolist()):
+        part_rows, row_index = np.unique(rows[start:start + size], return_inverse=True)
+        part_cols, col_index = np.unique(cols[start:start + size], return_inverse=True)
+        cost = np.full((len(part_rows), len(part_cols)), GATED_COST)
+        cost[row_index, col_index] = costs[start:start + size]
+
+        assigned_rows, assigned_cols = linear_assignment(cost)
+        keep = cost[assigned_rows, assigned_cols] < GATED_COST
+        matched_rows.append(part_rows[assigned_rows[keep]])
+        matched_cols.append(part_cols[assigned_cols[keep]])
+    return np.concatenate(matched_rows), np.concatenate(matched_cols)
+
+class KalmanBoxFilter:
+    """Constant-velocity Kalman filter for many boxes at once (SORT-style)
+
+    State per row: cx, cy, w, h and their velocities. Callers keep the rows
+    in stacked (N, 8) mean / (N, 8, 8) covariance arrays (see TrackStore);
+    every method works on all given rows with batched matrix ops. Noise
+    scales with box size, so large and small faces get comparable relative
+    uncertainty.
+    """
+    STD_POSITION = 1.0 / 20
+    STD_VELOCITY = 1.0 / 160
+    # Prior on the speed of a new track (box heights per frame), wide enough
+    # that fast walkers are matched on their second detection
+    STD_INITIAL_SPEED = 1.0
+    # 95% chi-square quantile for 4 degrees of freedom (cx, cy, w, h)
+    GATE_CHI2 = 9.4877
+
+    def __init__(self):
+        # Transition: position += velocity; measurement picks cx, cy, w, h
+        self.F = np.eye(8)
+        self.F[:4, 4:] = np.eye(4)
+
+    def initiate(self, boxes):
+        """Initial (K, 8) mean and (K, 8, 8) covariance for (K, 4) boxes (x, y, w, h)"""
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        mean = np.zeros((len(boxes), 8))
+        mean[:, :2] = boxes[:, :2] + boxes[:, 2:4] / 2.0
+        mean[:, 2:4] = boxes[:, 2:4]
+
+        size = np.maximum(boxes[:, 3], 1.0)[:, None]
+        std = np.hstack([np.repeat(2 * self.STD_POSITION * size, 4, axis=1),
+                         np.repeat(self.STD_INITIAL_SPEED * size, 2, axis=1),
+                         np.repeat(10 * self.STD_VELOCITY * size, 2, axis=1)])
+        cov = np.zeros((len(boxes), 8, 8))
+        cov[:, np.arange(8), np.arange(8)] = std ** 2
+        return mean, cov
+
+    def predict(self, mean, cov):
+        """Advance every row one frame"""
+        size = np.maximum(mean[:, 3], 1.0)[:, None]
+        q = np.hstack([np.repeat((self.STD_POSITION * size) ** 2, 4, axis=1),
+                       np.repeat((self.STD_VELOCITY * size) ** 2, 4, axis=1)])
+
+        mean = mean @ self.F.T
+        cov = self.F @ cov @ self.F.T
+        cov[:, np.arange(8), np.arange(8)] += q
+        return mean, cov
+
+    @staticmethod
+    def measure(boxes):
+        """(K, 4) measurements (cx, cy, w, h) for boxes (x, y, w, h)"""
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        z = np.empty((len(boxes), 4))
+        z[:, :2] = boxes[:, :2] + boxes[:, 2:4] / 2.0
+        z[:, 2:4] = boxes[:, 2:4]
+        return z
+
+    def innovation_covariance(self, mean, cov):
+        """(N, 4, 4) covariance S of the expected measurement of every row"""
+        size = np.maximum(mean[:, 3], 1.0)[:, None]
+        r = np.repeat((self.STD_POSITION * size) ** 2, 4, axis=1)
+
+        # H selects the first four state entries, so H P H^T is a slice
+        S = cov[:, :4, :4].copy()
+        S[:, np.arange(4), np.arange(4)] += r
+        return S
+
+    def update(self, mean, cov, boxes):
+        """Correct rows with measured (K, 4) boxes (x, y, w, h)"""
+        z = self.measure(boxes)
+        S = self.innovation_covariance(mean, cov)
+        PHt = cov[:, :, :4]
+        K = np.linalg.solve(S, PHt.transpose(0, 2, 1)).transpose(0, 2, 1)
+
+        innovation = z - mean[:, :4]
+        mean = mean + (K @ innovation[:, :, None])[:, :, 0]
+        cov = cov - K @ S @ K.transpose(0, 2, 1)
+        return mean, cov
+
+    @staticmethod
+    def boxes(mean):
+        """(N, 4) boxes (x, y, w, h) from state rows"""
+        boxes = np.empty((len(mean), 4))
+        boxes[:, 2:4] = np.maximum(mean[:, 2:4], 1.0)
+        boxes[:, :2] = mean[:, :2] - boxes[:, 2:4] / 2.0
+        return boxes
+
+# Empty slot selection
+NO_SLOTS = np.empty(0, dtype=np.int64)
+
+class TrackStore:
+    """Struct-of-arrays track storage with slot reuse
+
+    Every track lives in one slot of preallocated NumPy columns (ids, boxes,
+    confidences, disappeared counters, ages, Kalman state). Freed slots go on
+    a free-list and are reused; the columns double in size when full. Other
+    components (e.g. VisitorCounter) can add their own per-track columns,
+    which are reset whenever a slot is allocated.
+    """
+    def __init__(self, capacity=64):
+        self.capacity = 0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 4), dtype=np.float64)  # Last measured or predicted (x, y, w, h)
+        self.confidences = np.empty(0, dtype=np.float32)
+        self.disappeared = np.empty(0, dtype=np.int32)
+        self.ages = np.empty(0, dtype=np.int32)
+        self.active = np.empty(0, dtype=bool)
+        self.mean = np.empty((0, 8), dtype=np.float64)
+        self.cov = np.empty((0, 8, 8), dtype=np.float64)
+        self.columns = {}  # name -> fill value for extra columns
+        self.free = []
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        """Enlarge every column to the given capacity"""
+        extra = capacity - self.capacity
+        for name, fill in [('ids', -1), ('boxes', 0), ('confidences', 0), ('disappeared', 0),
+                           ('ages', 0), ('active', False), ('mean', 0), ('cov', 0)]:
+            column = getattr(self, name)
+            padding = np.full((extra,) + column.shape[1:], fill, dtype=column.dtype)
+            setattr(self, name, np.concatenate([column, padding]))
+        for name, fill in self.columns.items():
+            column = getattr(self, name)
+            setattr(self, name, np.concatenate([column, np.full(extra, fill, dtype=column.dtype)]))
+
+        # Lowest slots are handed out first
+        self.free.extend(range(capacity - 1, self.capacity - 1, -1))
+        self.free.sort(reverse=True)
+        self.capacity = capacity
+
+    def add_column(self, name, dtype, fill):
+        """Add (or reset) an extra per-track column"""
+        self.columns[name] = fill
+        setattr(self, name, np.full(self.capacity, fill, dtype=dtype))
+
+    def allocate(self, count):
+        """Take count free slots (growing if needed) and reset their columns"""
+        if count > len(self.free):
+            self._grow(max(self.capacity * 2, self.capacity + count))
+        slots = np.array([self.free.pop() for _ in range(count)], dtype=np.int64)
+        self.active[slots] = True
+        self.disappeared[slots] = 0
+        self.ages[slots] = 0
+        for name, fill in self.columns.items():
+            getattr(self, name)[slots] = fill
+        return slots
+
+    def release(self, slots):
+        """Return slots to the free-list"""
+        self.active[slots] = False
+        self.ids[slots] = -1
+        self.free.extend(np.asarray(slots).tolist())
+
+    def active_slots(self):
+        """Indices of slots holding a track"""
+        return np.flatnonzero(self.active)
+
+    def __len__(self):
+        return self.capacity - len(self.free)
 
 class SimpleTracker:
-    """Simple centroid-based tracker"""
-    def __init__(self, max_disappeared=30):
+    """Simple tracker with a Kalman motion model
+
+    Tracks live in a TrackStore; update() and predict() return the slots of
+    the tracks visible in this frame (read ids/boxes from tracker.store).
+    Association runs against the predicted boxes, so fast walkers are matched
+    where they are expected to be rather than where they were last seen. The
+    gate is the Mahalanobis distance under the filter's innovation covariance:
+    it is wide for new tracks and grows with every frame without a
+    measurement, so neither a fast walker nor a detector gap starts a new ID.
+    """
+    def __init__(self, max_disappeared=30, max_distance=100, capacity=64, grid_min_pairs=40000):
         self.next_id = 0
-        self.objects = OrderedDict()
-        self.disappeared = OrderedDict()
         self.max_disappeared = max_disappeared
-
-    def register(self, centroid):
-        """Register a new object"""
-        self.objects[self.next_id] = centroid
-        self.disappeared[self.next_id] = 0
-        self.next_id += 1
-        return self.next_id - 1
+        self.max_distance = max_distance  # Distance from the prediction always allowed, whatever the gate
+        self.grid_min_pairs = grid_min_pairs  # Tracks x detections above which the grid index is used
+        self.store = TrackStore(capacity)
+        self.kalman = KalmanBoxFilter()
+        self.frame_index = 0
+
+    def _register_many(self, detections):
+        """Register tracks for an (K, 5) detection array, returns their slots"""
+        store = self.store
+        slots = store.allocate(len(detections))
+        store.ids[slots] = np.arange(self.next_id, self.next_id + len(detections))
+        store.boxes[slots] = detections[:, :4]
+        store.confidences[slots] = detections[:, 4]
+        store.mean[slots], store.cov[slots] = self.kalman.initiate(detections[:, :4])
+        self.next_id += len(detections)
+        return slots
+
+    def register(self, centroid, detection=None):
+        """Register a new object, returns its id"""
+        if detection is None:
+            detection = (centroid[0], centroid[1], 0, 0, 0.0)
+        slot = self._register_many(np.asarray([detection], dtype=np.float64))[0]
+        return int(self.store.ids[slot])
 
     def deregister(self, object_id):
         """Remove object from tracking"""
-        del self.objects[object_id]
-        del self.disappeared[object_id]
+        self.store.release(np.flatnonzero(self.store.active & (self.store.ids == object_id)))
 
-    def update(self, detections):
-        """Update tracker with new detections"""
-        if len(detections) == 0:
-            # Mark all existing objects as disappeared
-            for object_id in list(self.disappeared.keys()):
-                self.disappeared[object_id] += 1
-                if self.disappeared[object_id] > self.max_disappeared:
-                    self.deregister(object_id)
-            return {}
-
-        # Calculate centroids from detections
-        input_centroids = []
-        for (x, y, w, h, _) in detections:
-            cx = int(x + w / 2.0)
-            cy = int(y + h / 2.0)
-            input_centroids.append((cx, cy))
-
-        # If no existing objects, register all detections
-        if len(self.objects) == 0:
-            for centroid in input_centroids:
-                self.register(centroid)
-        else:
-            # Match existing objects to new detections
-            object_centroids = list(self.objects.values())
-            object_ids = list(self.objects.keys())
-
-            # Compute distances
-            D = dist.cdist(np.array(object_centroids), input_centroids)
-
-            # Find minimum distance assignments
-            rows = D.min(axis=1).argsort()
-            cols = D.argmin(axis=1)[rows]
-
-            used_rows = set()
-            used_cols = set()
+    def _predict(self, slots):
+        """Advance the Kalman state of the given slots and store the predicted boxes"""
+        if not len(slots):
+            return
+        store = self.store
+        store.mean[slots], store.cov[slots] = self.kalman.predict(store.mean[slots], store.cov[slots])
+        store.boxes[slots] = self.kalman.boxes(store.mean[slots])
 
-            # Update matched objects
-            for (row, col) in zip(rows, cols):
-                if row in used_rows or col in used_cols:
-                    continue
+    def predict(self):
+        """Carry tracks forward one frame (no detector run), returns the visible slots"""
+        self.frame_index += 1
+        slots = self.store.active_slots()
+        self._predict(slots)
+        return slots[self.store.disappeared[slots] == 0]
 
-                if D[row, col] > 100:  # Maximum distance threshold
-                    continue
+    def update(self, detections):
+        """Update tracker with an (N, 5) detection array, returns one slot per detection
+
+        All tracks are predicted first; objects are then matched to detections
+        by optimal assignment over an IoU + distance cost against the
+        predicted boxes. Pairs with no overlap that are outside both the
+        Mahalanobis gate and max_distance are never matched.
+        """
+        self.frame_index += 1
+        store = self.store
+        slots = store.active_slots()
+        self._predict(slots)
+        store.ages[slots] += 1
+
+        detections = np.asarray(detections, dtype=np.float64).reshape(-1, 5)
+        result = np.empty(len(detections), dtype=np.int64)
+        matched = np.zeros(len(slots), dtype=bool)
+        unmatched_cols = np.ones(len(detections), dtype=bool)
+
+        # Match existing objects to new detections (row = slot, col = detection)
+        if len(slots) and len(detections):
+            rows, cols = self._associate(slots, detections[:, :4])
+
+            # Batched correction of the matched tracks
+            matched_slots = slots[rows]
+            store.mean[matched_slots], store.cov[matched_slots] = self.kalman.update(
+                store.mean[matched_slots], store.cov[matched_slots], detections[cols, :4]
+            )
+            store.boxes[matched_slots] = detections[cols, :4]
+            store.confidences[matched_slots] = detections[cols, 4]
+            store.disappeared[matched_slots] = 0
+            matched[rows] = True
+            unmatched_cols[cols] = False
+            result[cols] = matched_slots
+
+        # Mark unmatched objects as disappeared, drop expired ones
+        missed = slots[~matched]
+        store.disappeared[missed] += 1
+        store.release(missed[store.disappeared[missed] > self.max_disappeared])
+
+        # Register new objects for unmatched detections
+        if unmatched_cols.any():
+            result[unmatched_cols] = self._register_many(detections[unmatched_cols])
 
-                object_id = object_ids[row]
-                self.objects[object_id] = input_centroids[col]
-                self.disappeared[object_id] = 0
+        return result
 
-                used_rows.add(row)
-                used_cols.add(col)
+    def _associate(self, slots, detection_boxes):
+        """Matched (rows, cols) between the predicted tracks at slots and detections
+
+        Small frames use the dense cost matrix; crowded ones only score the
+        pairs found by the spatial grid and solve the sparse cost.
+        """
+        store = self.store
+        predicted_boxes = store.boxes[slots]
+        expected = self.kalman.measure(predicted_boxes)
+        S = self.kalman.innovation_covariance(store.mean[slots], store.cov[slots])
+        S_inv = np.linalg.inv(S)
+        measured = self.kalman.measure(detection_boxes)
+
+        if len(predicted_boxes) * len(detection_boxes) < self.grid_min_pairs:
+            cost, allowed = self._cost_matrix(predicted_boxes, detection_boxes, expected, S_inv, measured)
+            rows, cols = linear_assignment(cost)
+            keep = allowed[rows, cols]
+            return rows[keep], cols[keep]
+
+        # The grid covers the gates of most tracks; the few that reach further
+        # (long unseen) pair with every detection
+        gate_radius = np.sqrt(KalmanBoxFilter.GATE_CHI2 * np.maximum(S[:, 0, 0], S[:, 1, 1]))
+        reach = max(float(self.max_distance), float(predicted_boxes[:, 2:4].max()),
+                    float(np.percentile(gate_radius, 90)))
+        narrow = np.flatnonzero(gate_radius <= reach)
+        wide = np.flatnonzero(gate_radius > reach)
+        rows, cols = grid_candidate_pairs(predicted_boxes[narrow], detection_boxes, reach)
+        rows = np.concatenate([narrow[rows], np.repeat(wide, len(detection_boxes))])
+        cols = np.concatenate([cols, np.tile(np.arange(len(detection_boxes)), len(wide))])
+
+        costs, allowed = self._pair_costs(predicted_boxes[rows], detection_boxes[cols],
+                                          expected[rows] - measured[cols], S_inv[rows])
+        return sparse_assignment(rows[allowed], cols[allowed], costs[allowed], len(predicted_boxes))
+
+    def _gated_cost(self, overlaps, distances, mahalanobis):
+        """Association cost (1 - IoU + normalized distance) and gating mask
+
+        A pair passes when the boxes overlap, the detection is inside the
+        chi-square gate of the track, or it is within max_distance. The
+        distance term uses whichever of the two gates admits the pair more
+        comfortably.
+        """
+        gate = mahalanobis / KalmanBoxFilter.GATE_CHI2
+        allowed = (gate <= 1.0) | (distances <= self.max_distance) | (overlaps > 0)
+        return (1.0 - overlaps) + np.minimum(gate, distances / self.max_distance), allowed
+
+    def _pair_costs(self, predicted_boxes, detection_boxes, residuals, S_inv):
+        """Association cost and gating mask for row-aligned box pairs"""
+        distances = np.linalg.norm(residuals[:, :2], axis=1)
+        mahalanobis = np.einsum('pi,pij,pj->p', residuals, S_inv, residuals)
+        return self._gated_cost(pairwise_iou(predicted_boxes, detection_boxes), distances, mahalanobis)
+
+    def _cost_matrix(self, predicted_boxes, detection_boxes, expected, S_inv, measured):
+        """Vectorized association cost and gating mask for all track/detection pairs"""
+        residuals = expected[:, None, :] - measured[None, :, :]
+        distances = np.linalg.norm(residuals[:, :, :2], axis=2)
+        mahalanobis = np.einsum('tdi,tij,tdj->td', residuals, S_inv, residuals)
+
+        cost, allowed = self._gated_cost(iou_matrix(predicted_boxes, detection_boxes), distances, mahalanobis)
+        cost[~allowed] = GATED_COST
+        return cost, allowed
+
+    def tracked_objects(self, slots):
+        """object_id -> (x, y, w, h, confidence) for the given slots (for display/logging)"""
+        store = self.store
+        result = {}
+        for slot in slots.tolist():
+            x, y, w, h = store.boxes[slot]
+            result[int(store.ids[slot])] = (int(round(x)), int(round(y)), int(round(w)), int(round(h)),
+                                            float(store.confidences[slot]))
+        return result
 
-            # Handle unmatched detections and objects
-            unused_rows = set(range(0, D.shape[0])).difference(used_rows)
-            unused_cols = set(range(0, D.shape[1])).difference(used_cols)
+def benchmark_association(counts=(10, 30, 100, 300, 1000), repeats=5, frame_size=(3840, 2160)):
+    """Time dense vs grid association for synthetic crowds, returns one row per count
+
+    Faces are scattered over the frame with small per-frame motion, as in a
+    crowded entrance; both paths must produce the same number of matches.
+    """
+    rng = np.random.default_rng(0)
+    rows = []
+    for count in counts:
+        sizes = rng.uniform(24, 64, size=(count, 1))
+        corners = rng.uniform((0, 0), (frame_size[0] - 64, frame_size[1] - 64), size=(count, 2))
+        previous = np.hstack([corners, sizes, sizes])
+        current = previous.copy()
+        current[:, :2] += rng.normal(0, 4, size=(count, 2))
+
+        timings = {}
+        matches = {}
+        for name, grid_min_pairs in (("dense", float("inf")), ("grid", 0)):
+            tracker = SimpleTracker(grid_min_pairs=grid_min_pairs)
+            slots = tracker.update(np.hstack([previous, np.ones((count, 1))]))
+            samples = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                matched_rows, _ = tracker._associate(slots, current)
+                samples.append(time.perf_counter() - start)
+            timings[name] = float(np.median(samples)) * 1000
+            matches[name] = len(matched_rows)
+
+        rows.append({
+            'detections': count,
+            'dense_ms': round(timings['dense'], 3),
+            'grid_ms': round(timings['grid'], 3),
+            'speedup': round(timings['dense'] / max(timings['grid'], 1e-9), 1),
+            'matches_equal': matches['dense'] == matches['grid']
+        })
+    return rows
+
+class VectorIndex:
+    """In-memory cosine index over L2-normalized embeddings
+
+    One row per key in a preallocated matrix; top-k search is a single
+    matrix product. Rows unused for ttl seconds expire, and when the index is
+    full the least recently used row is evicted.
+    """
+    def __init__(self, capacity=10000, ttl=None):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.vectors = None  # Allocated on first add, once the dimension is known
+        self.keys = np.full(capacity, -1, dtype=np.int64)
+        self.last_used = np.zeros(capacity)
+        self.rows = {}  # key -> row
+        self.evicted = 0
+
+    def _expire(self, now):
+        """Drop rows unused for longer than the TTL"""
+        if self.ttl is None or not self.rows:
+            return
+        for row in np.flatnonzero((self.keys >= 0) & (now - self.last_used > self.ttl)).tolist():
+            self.remove(int(self.keys[row]))
+            self.evicted += 1
+
+    def add(self, key, vector):
+        """Insert or replace the embedding stored for key"""
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        if self.vectors is None:
+            self.vectors = np.zeros((self.capacity, len(vector)), dtype=np.float32)
+
+        now = time.monotonic()
+        row = self.rows.get(key)
+        if row is None:
+            self._expire(now)
+            free = np.flatnonzero(self.keys < 0)
+            if len(free):
+                row = int(free[0])
+            else:
+                # Full: evict the least recently used key
+                row = int(np.argmin(self.last_used))
+                del self.rows[int(self.keys[row])]
+                self.evicted += 1
+            self.rows[key] = row
+            self.keys[row] = key
+
+        self.vectors[row] = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        self.last_used[row] = now
+
+    def get(self, key):
+        """Stored embedding for key, or None"""
+        row = self.rows.get(key)
+        return None if row is None else self.vectors[row]
+
+    def remove(self, key):
+        """Forget key"""
+        row = self.rows.pop(key, None)
+        if row is not None:
+            self.keys[row] = -1
+            self.vectors[row] = 0
+
+    def search(self, vectors, k=5):
+        """Top-k (keys, similarities) per query row; missing results are key -1"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors = vectors.reshape(len(vectors), -1) if vectors.size else vectors.reshape(0, 1)
+        keys = np.full((len(vectors), k), -1, dtype=np.int64)
+        similarities = np.full((len(vectors), k), -np.inf, dtype=np.float32)
+        self._expire(time.monotonic())
+        if not self.rows or not len(vectors):
+            return keys, similarities
+
+        rows = np.fromiter(self.rows.values(), dtype=np.int64, count=len(self.rows))
+        queries = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        scores = queries @ self.vectors[rows].T
+
+        count = min(k, len(rows))
+        top = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        keys[:, :count] = self.keys[rows[top]]
+        similarities[:, :count] = np.take_along_axis(top_scores, order, axis=1)
+        return keys, similarities
+
+    def __len__(self):
+        return len(self.rows)
+
+class FaceEmbedder:
+    """Face embedding ONNX model (e.g. MobileFaceNet/ArcFace) on CPU
+
+    Uses onnxruntime when installed and OpenCV DNN otherwise. Crops are
+    resized to the model input, converted to RGB and normalized with the
+    usual (x - 127.5) / 128 convention.
+    """
+    def __init__(self, model_path):
+        if ONNXRUNTIME_AVAILABLE:
+            with STARTUP.measure("import onnxruntime"):
+                import onnxruntime as ort
+
+            self.session = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+            model_input = self.session.get_inputs()[0]
+            self.input_name = model_input.name
+            input_shape = model_input.shape
+            self.net = None
+        else:
+            self.session = None
+            self.net = cv2.dnn.readNetFromONNX(model_path)
+            input_shape = [1, 3, 112, 112]
+
+        # Static batch models take one crop per call; dynamic sizes default to 112x112
+        self.max_batch = input_shape[0] if isinstance(input_shape[0], int) else None
+        self.input_size = tuple(d if isinstance(d, int) else 112 for d in input_shape[2:4])
+
+    def _infer(self, batch):
+        """Run the model on an NCHW float32 batch"""
+        if self.session is not None:
+            return self.session.run(None, {self.input_name: batch})[0]
+        self.net.setInput(batch)
+        return self.net.forward()
+
+    def embed(self, crops):
+        """(N, D) L2-normalized embeddings for a list of BGR crops"""
+        height, width = self.input_size
+        batch = np.empty((len(crops), 3, height, width), dtype=np.float32)
+        for i, crop in enumerate(crops):
+            resized = cv2.resize(crop, (width, height), interpolation=cv2.INTER_LINEAR)
+            batch[i] = resized[:, :, ::-1].transpose(2, 0, 1)
+        batch -= 127.5
+        batch /= 128.0
+
+        step = self.max_batch or len(crops)
+        embeddings = np.vstack([
+            np.asarray(self._infer(batch[i:i + step])).reshape(len(batch[i:i + step]), -1)
+            for i in range(0, len(crops), step)
+        ])
+        return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+class ReIdentifier:
+    """Appearance re-identification of tracks into visitor identities
+
+    Each track gets an embedding of its face crop at most once every interval
+    frames (new tracks right away). The first embedding is matched against
+    the VectorIndex; a close enough identity not held by another visible
+    track is reused, otherwise a new visitor identity is created. Later
+    embeddings refresh the identity's stored vector (running average), which
+    keeps it from expiring while the visitor is in view. The visitor id lives
+    in the TrackStore column visitor_ids; one ReIdentifier can be shared by
+    several cameras.
+    """
+    def __init__(self, embedder, index=None, interval=10, threshold=0.5, top_k=5,
+                 min_face_size=24, momentum=0.8):
+        self.embedder = embedder
+        self.index = index if index is not None else VectorIndex()
+        self.interval = interval
+        self.threshold = threshold
+        self.top_k = top_k
+        self.min_face_size = min_face_size  # Smaller crops give unreliable embeddings
+        self.momentum = momentum  # Weight of the stored vector when refreshing
+        self.next_visitor_id = 0
+        self.embedded = 0
+        self.reused = 0
+        self.lock = threading.Lock()
+
+    def _new_visitor(self):
+        visitor_id = self.next_visitor_id
+        self.next_visitor_id += 1
+        return visitor_id
+
+    def update(self, store, slots, frame, frame_index):
+        """Embed the due tracks at slots in frame and resolve their visitor ids"""
+        if 'visitor_ids' not in store.columns:
+            store.add_column('visitor_ids', np.int64, -1)
+            store.add_column('reid_frame', np.int64, np.iinfo(np.int64).min // 2)
+        if not len(slots):
+            return
 
-            # Mark unmatched objects as disappeared
-            if D.shape[0] >= D.shape[1]:
-                for row in unused_rows:
-                    object_id = object_ids[row]
-                    self.disappeared[object_id] += 1
-                    if self.disappeared[object_id] > self.max_disappeared:
-                        self.deregister(object_id)
+        due = slots[frame_index - store.reid_frame[slots] >= self.interval]
+        boxes = np.round(store.boxes[due]).astype(int)
+        big_enough = (boxes[:, 2] >= self.min_face_size) & (boxes[:, 3] >= self.min_face_size)
+        due, boxes = due[big_enough], boxes[big_enough]
+        if not len(due):
+            return
 
-            # Register new objects for unmatched detections
-            else:
-                for col in unused_cols:
-                    self.register(input_centroids[col])
+        frame_h, frame_w = frame.shape[:2]
+        x1 = np.clip(boxes[:, 0], 0, frame_w)
+        y1 = np.clip(boxes[:, 1], 0, frame_h)
+        x2 = np.clip(boxes[:, 0] + boxes[:, 2], 0, frame_w)
+        y2 = np.clip(boxes[:, 1] + boxes[:, 3], 0, frame_h)
+        visible = (x2 > x1) & (y2 > y1)
+        due = due[visible]
+        crops = [frame[top:bottom, left:right]
+                 for left, top, right, bottom in zip(x1[visible], y1[visible], x2[visible], y2[visible])]
+        if not crops:
+            return
 
-        # Return mapping of object_id -> detection
-        result = {}
-        for i, detection in enumerate(detections):
-            if i < len(input_centroids):
-                centroid = input_centroids[i]
-                for obj_id, obj_centroid in self.objects.items():
-                    if obj_centroid == centroid:
-                        result[obj_id] = detection
+        embeddings = self.embedder.embed(crops)
+        store.reid_frame[due] = frame_index
+        self.embedded += len(due)
+
+        with self.lock:
+            new = store.visitor_ids[due] < 0
+            keys, similarities = self.index.search(embeddings[new], self.top_k)
+            held = set(store.visitor_ids[slots].tolist())
+            for i, slot in enumerate(due[new].tolist()):
+                visitor_id = None
+                for key, similarity in zip(keys[i].tolist(), similarities[i].tolist()):
+                    if key >= 0 and similarity >= self.threshold and key not in held:
+                        visitor_id = key
+                        self.reused += 1
                         break
+                if visitor_id is None:
+                    visitor_id = self._new_visitor()
+                store.visitor_ids[slot] = visitor_id
+                held.add(visitor_id)
+
+            for slot, embedding in zip(due.tolist(), embeddings):
+                visitor_id = int(store.visitor_ids[slot])
+                stored = self.index.get(visitor_id)
+                if stored is not None:
+                    embedding = self.momentum * stored + (1 - self.momentum) * embedding
+                self.index.add(visitor_id, embedding)
 
-        return result
+    def get_stats(self):
+        """Embedding and index counters"""
+        return {
+            'embedded': self.embedded,
+            'reused_identities': self.reused,
+            'visitors': self.next_visitor_id,
+            'indexed': len(self.index),
+            'evicted': self.index.evicted
+        }
+
+def to_epoch_ms(value):
+    """Epoch milliseconds from a datetime (naive = local time) or a number of epoch ms"""
+    if isinstance(value, datetime):
+        return int(round(value.timestamp() * 1000))
+    return int(value)
 
 class SimpleDatabase:
-    """Simple SQLite database"""
-    def __init__(self, db_path="data/tracker.db"):
+    """Simple SQLite database
+
+    The schema is versioned with PRAGMA user_version and migrated on open.
+    Event timestamps are epoch milliseconds; (camera_id, timestamp,
+    event_type) and (timestamp, event_type) indexes cover the time-range
+    queries (event_counts, occupancy). Single-camera events use camera_id ''.
+    Per-minute, per-hour and per-day counts (ROLLUPS) are upserted in the same
+    transaction as each event batch, so range queries read pre-aggregated
+    rows and only touch raw events at unaligned range edges.
+
+    In batched mode (default) log_event only queues the row; a writer thread
+    keeps one WAL connection and inserts queued rows with executemany, one
+    transaction per batch_size rows or flush_interval seconds. close() writes
+    what is left and checkpoints the WAL so the data is durable on disk.
+    """
+    def __init__(self, db_path="data/tracker.db", batched=True, batch_size=100, flush_interval=1.0):
         self.db_path = db_path
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         self._init_db()
 
+        self.batched = batched
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.batches_written = 0
+        self.writer = None
+        if batched:
+            self.queue = queue.Queue()
+            self.writer = threading.Thread(target=self._write_loop, name="db-writer", daemon=True)
+            self.writer.start()
+
+    def _connect(self):
+        """Connection with WAL journaling (readers don't block the writer)"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
     def _init_db(self):
-        """Initialize database"""
+        """Initialize database and apply pending schema migrations
+
+        Each migration runs in an explicit transaction (DDL included) together
+        with its user_version bump, so a failed migration leaves the previous
+        schema intact. Errors are raised: the app must not run on a schema
+        its inserts don't match.
+        """
+        conn = self._connect()
+        conn.isolation_level = None  # Manual transactions, so DDL is rolled back as well
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # Create events table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS events (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    object_id INTEGER,
-                    event_type TEXT,
-                    timestamp TEXT,
-                    image_path TEXT
-                )
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for target, migration in enumerate(self.MIGRATIONS[version:], start=version + 1):
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    getattr(self, migration)(conn)
+                    conn.execute(f"PRAGMA user_version = {target}")
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _migrate_v1(conn):
+        """Original events table"""
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                object_id INTEGER,
+                event_type TEXT,
+                timestamp TEXT,
+                image_path TEXT
+            )
+        """)
+
+    @staticmethod
+    def _migrate_v2(conn):
+        """Epoch-ms integer timestamps, camera_id and covering indexes
+
+        Rows whose ISO timestamp is NULL or unparseable are kept with
+        timestamp 0 (the epoch) rather than dropped, so totals stay complete.
+        """
+        conn.execute("DROP TABLE IF EXISTS events_v2")  # Left over by pre-transactional upgrades
+        conn.execute("""
+            CREATE TABLE events_v2 (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                object_id INTEGER,
+                camera_id TEXT NOT NULL DEFAULT '',
+                event_type TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,
+                image_path TEXT
+            )
+        """)
+        # ISO text was written in local time
+        conn.execute("""
+            INSERT INTO events_v2 (id, object_id, camera_id, event_type, timestamp, image_path)
+            SELECT id, object_id, '', COALESCE(event_type, ''),
+                   COALESCE(CAST(ROUND((julianday(timestamp, 'utc') - 2440587.5) * 86400000) AS INTEGER), 0),
+                   image_path
+            FROM events
+        """)
+        conn.execute("DROP TABLE events")
+        conn.execute("ALTER TABLE events_v2 RENAME TO events")
+        conn.execute("CREATE INDEX idx_events_camera_time ON events (camera_id, timestamp, event_type)")
+        conn.execute("CREATE INDEX idx_events_time ON events (timestamp, event_type)")
+
+    @classmethod
+    def _migrate_v3(cls, conn):
+        """Rollup tables, filled from the existing events"""
+        for table, _ in cls.ROLLUPS:
+            conn.execute(f"""
+                CREATE TABLE {table} (
+                    camera_id TEXT NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    event_type TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (camera_id, bucket, event_type)
+                ) WITHOUT ROWID
+            """)
+            conn.execute(f"CREATE INDEX idx_{table}_bucket ON {table} (bucket, event_type, count)")
+        cls._fill_rollups(conn)
+
+    # Schema version N is reached by running MIGRATIONS[N - 1]
+    MIGRATIONS = ("_migrate_v1", "_migrate_v2", "_migrate_v3")
+
+    # Rollup tables, coarsest first: (table, bucket size in ms)
+    ROLLUPS = (("rollups_day", 86400000), ("rollups_hour", 3600000), ("rollups_minute", 60000))
+
+    @classmethod
+    def _fill_rollups(cls, conn):
+        """Recompute every rollup table from the raw events"""
+        for table, size in cls.ROLLUPS:
+            conn.execute(f"DELETE FROM {table}")
+            conn.execute(f"""
+                INSERT INTO {table} (camera_id, bucket, event_type, count)
+                SELECT camera_id, (timestamp / {size}) * {size} AS bucket, event_type, COUNT(*)
+                FROM events GROUP BY camera_id, bucket, event_type
             """)
 
-            conn.commit()
+    def rebuild_rollups(self):
+        """Rebuild the rollups from raw events (after manual edits or a crash mid-upgrade)"""
+        self.flush()
+        conn = self._connect()
+        try:
+            with conn:
+                self._fill_rollups(conn)
+        finally:
             conn.close()
-        except Exception as e:
-            print(f"Database init error: {e}")
 
-    def log_event(self, object_id, event_type, image_path=None):
-        """Log an event"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+    def _insert(self, conn, rows):
+        """Insert event rows in one transaction"""
+        # Archived images are referenced once their writer has appended them
+        rows = [row[:4] + (row[4].result(),) if isinstance(row[4], Future) else row for row in rows]
+        with conn:
+            conn.executemany("""
+                INSERT INTO events (object_id, camera_id, event_type, timestamp, image_path)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+
+            # Rollups are updated in the same transaction as the events
+            for table, size in self.ROLLUPS:
+                counts = {}
+                for _, camera_id, event_type, timestamp, _ in rows:
+                    key = (camera_id, (timestamp // size) * size, event_type)
+                    counts[key] = counts.get(key, 0) + 1
+                conn.executemany(f"""
+                    INSERT INTO {table} (camera_id, bucket, event_type, count) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (camera_id, bucket, event_type) DO UPDATE SET count = count + excluded.count
+                """, [key + (count,) for key, count in counts.items()])
+        self.rows_written += len(rows)
+        self.batches_written += 1
+
+    def _write_loop(self):
+        """Writer thread: batch queued rows, handle flush requests and shutdown"""
+        conn = self._connect()
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False  # Flush interval passed
+
+            if isinstance(item, tuple):
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) < self.batch_size:
+                    continue
 
-            cursor.execute("""
-                INSERT INTO events (object_id, event_type, timestamp, image_path)
-                VALUES (?, ?, ?, ?)
-            """, (object_id, event_type, datetime.now().isoformat(), image_path))
+            if batch:
+                try:
+                    self._insert(conn, batch)
+                except Exception as e:
+                    print(f"Database log error: {e} ({len(batch)} events lost)")
+                batch = []
+            deadline = None
+
+            if isinstance(item, threading.Event):
+                item.set()  # Flush request
+            elif item is None:
+                # Shutdown: move the WAL into the database file and close
+                try:
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                except Exception as e:
+                    print(f"Database checkpoint error: {e}")
+                conn.close()
+                return
+
+    def log_event(self, object_id, event_type, image_path=None, timestamp=None, camera_id=None):
+        """Log an event (timestamp: datetime or epoch ms of the event, defaults to now)
+
+        image_path may be a Future (see SimpleLogger.save_image), resolved when
+        the row is written.
+        """
+        timestamp = to_epoch_ms(timestamp if timestamp is not None else datetime.now())
+        row = (object_id, camera_id or '', event_type, timestamp, image_path)
+        if self.batched:
+            self.queue.put(row)
+            return True
 
-            conn.commit()
+        try:
+            conn = self._connect()
+            self._insert(conn, [row])
             conn.close()
             return True
         except Exception as e:
             print(f"Database log error: {e}")
             return False
 
+    def flush(self):
+        """Block until every queued event is committed"""
+        if self.writer is not None and self.writer.is_alive():
+            done = threading.Event()
+            self.queue.put(done)
+            done.wait()
+
+    def close(self):
+        """Write the remaining events durably and stop the writer"""
+        if self.writer is not None and self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join()
+
+    def _range_filter(self, start, end, camera_id, column="timestamp"):
+        """WHERE clause and parameters for a time range, optionally for one camera"""
+        where = f"{column} >= ? AND {column} < ?"
+        params = [int(start), int(end)]
+        if camera_id is not None:
+            where = "camera_id = ? AND " + where
+            params.insert(0, camera_id)
+        return where, params
+
+    def _bucket_counts(self, conn, start_ms, end_ms, bucket_ms, camera_id):
+        """{(bucket, event_type): count} using the coarsest rollup that fits the buckets
+
+        The rollup-aligned middle of the range comes from the rollup table;
+        only the unaligned edges are counted from raw events.
+        """
+        counts = {}
+        def add(query, params):
+            for bucket, event_type, count in conn.execute(query, params):
+                counts[(bucket, event_type)] = counts.get((bucket, event_type), 0) + count
+
+        raw_ranges = [(start_ms, end_ms)]
+        for table, size in self.ROLLUPS:
+            if bucket_ms % size:
+                continue
+            inner_start = -(-start_ms // size) * size
+            inner_end = (end_ms // size) * size
+            if inner_start < inner_end:
+                where, params = self._range_filter(inner_start, inner_end, camera_id, column="bucket")
+                add(f"""
+                    SELECT (bucket / ?) * ? AS b, event_type, SUM(count) FROM {table}
+                    WHERE {where} GROUP BY b, event_type
+                """, [bucket_ms, bucket_ms] + params)
+                raw_ranges = [(start_ms, inner_start), (inner_end, end_ms)]
+            break
+
+        for range_start, range_end in raw_ranges:
+            if range_start < range_end:
+                where, params = self._range_filter(range_start, range_end, camera_id)
+                add(f"""
+                    SELECT (timestamp / ?) * ? AS b, event_type, COUNT(*) FROM events
+                    WHERE {where} GROUP BY b, event_type
+                """, [bucket_ms, bucket_ms] + params)
+        return counts
+
+    def _totals(self, conn, start_ms, end_ms, camera_id, level=0):
+        """{event_type: count} in [start_ms, end_ms): whole days, then hours, minutes, raw edges"""
+        totals = {}
+        if start_ms >= end_ms:
+            return totals
+
+        if level == len(self.ROLLUPS):
+            where, params = self._range_filter(start_ms, end_ms, camera_id)
+            return dict(conn.execute(
+                f"SELECT event_type, COUNT(*) FROM events WHERE {where} GROUP BY event_type", params
+            ).fetchall())
+
+        table, size = self.ROLLUPS[level]
+        inner_start = -(-start_ms // size) * size
+        inner_end = (end_ms // size) * size
+        if inner_start >= inner_end:
+            return self._totals(conn, start_ms, end_ms, camera_id, level + 1)
+
+        where, params = self._range_filter(inner_start, inner_end, camera_id, column="bucket")
+        parts = [conn.execute(
+            f"SELECT event_type, SUM(count) FROM {table} WHERE {where} GROUP BY event_type", params
+        ).fetchall()]
+        parts.append(self._totals(conn, start_ms, inner_start, camera_id, level + 1).items())
+        parts.append(self._totals(conn, inner_end, end_ms, camera_id, level + 1).items())
+        for part in parts:
+            for event_type, count in part:
+                totals[event_type] = totals.get(event_type, 0) + count
+        return totals
+
+    def totals(self, start=0, end=None, camera_id=None):
+        """Event counts by type over a time range (default: all time), read from the rollups"""
+        end_ms = to_epoch_ms(end if end is not None else datetime.now()) + (1 if end is None else 0)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return self._totals(conn, to_epoch_ms(start), end_ms, camera_id)
+        finally:
+            conn.close()
+
+    def event_counts(self, start, end, bucket_seconds=900, camera_id=None):
+        """Event counts per time bucket: [(bucket start epoch ms, event_type, count), ...]
+
+        Buckets are aligned to the epoch (UTC); camera_id=None counts all
+        cameras. Reads the rollups plus indexed raw events at the edges.
+        """
+        bucket_ms = int(bucket_seconds * 1000)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            counts = self._bucket_counts(conn, to_epoch_ms(start), to_epoch_ms(end), bucket_ms, camera_id)
+        finally:
+            conn.close()
+        return [(bucket, event_type, count) for (bucket, event_type), count in sorted(counts.items())]
+
+    def occupancy(self, start, end, bucket_seconds=900, camera_id=None):
+        """Occupancy (entries - exits so far) at the end of each bucket: [(bucket start epoch ms, occupancy), ...]"""
+        bucket_ms = int(bucket_seconds * 1000)
+        start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+
+        # Occupancy carried in from before the range
+        conn = sqlite3.connect(self.db_path)
+        try:
+            before = self._totals(conn, 0, start_ms, camera_id)
+            counts = self._bucket_counts(conn, start_ms, end_ms, bucket_ms, camera_id)
+        finally:
+            conn.close()
+        current = max(0, before.get('entry', 0) - before.get('exit', 0))
+
+        per_bucket = {}
+        for (bucket, event_type), count in counts.items():
+            change = count if event_type == 'entry' else -count if event_type == 'exit' else 0
+            per_bucket[bucket] = per_bucket.get(bucket, 0) + change
+
+        result = []
+        for bucket in range((start_ms // bucket_ms) * bucket_ms, end_ms, bucket_ms):
+            current = max(0, current + per_bucket.get(bucket, 0))
+            result.append((bucket, current))
+        return result
+
+    def get_stats(self):
+        return {'rows_written': self.rows_written, 'batches': self.batches_written}
+
 class VisitorCounter:
-    """Simple visitor counter"""
+    """Simple visitor counter
+
+    Per-track state (last center y, crossed flag) lives in columns of the
+    tracker's TrackStore, so a frame is counted with a few array operations.
+    """
     def __init__(self, frame_height):
         self.detection_line = frame_height // 2  # Middle of frame
-        self.track_states = {}  # track_id -> {last_y, crossed}
+        self.store = None
         self.entry_count = 0
         self.exit_count = 0
         self.unique_visitors = set()
 
-    def update(self, tracked_objects):
-        """Update counter with tracked objects"""
+    def update(self, store, slots):
+        """Update counter with the tracks in store at slots"""
+        if self.store is not store:
+            # Fresh state columns (also after a counter reset)
+            store.add_column('counter_last_y', np.float64, np.nan)
+            store.add_column('counter_crossed', bool, False)
+            self.store = store
+
         events = []
+        if not len(slots):
+            return events
+
+        boxes = store.boxes[slots]
+        center_y = boxes[:, 1] + boxes[:, 3] / 2.0
+        last_y = store.counter_last_y[slots]
+        line = self.detection_line
+
+        # New tracks only get their position recorded; crossed tracks are done
+        candidates = ~np.isnan(last_y) & ~store.counter_crossed[slots]
+        entries = candidates & (last_y < line) & (line < center_y)  # From top to bottom
+        exits = candidates & (last_y > line) & (line > center_y)  # From bottom to top
+
+        for index in np.flatnonzero(entries | exits).tolist():
+            slot = slots[index]
+            track_id = int(store.ids[slot])
+            event_type = 'entry' if entries[index] else 'exit'
+            if event_type == 'entry':
+                self.entry_count += 1
+                self.unique_visitors.add(self._visitor_key(store, slot, track_id))
+            else:
+                self.exit_count += 1
+            store.counter_crossed[slot] = True
 
-        for track_id, (x, y, w, h, conf) in tracked_objects.items():
-            center_y = y + h // 2
-
-            # Initialize track state
-            if track_id not in self.track_states:
-                self.track_states[track_id] = {
-                    'last_y': center_y,
-                    'crossed': False
-                }
-
-            state = self.track_states[track_id]
-
-            # Check for line crossing
-            if not state['crossed']:
-                # Entry: from top to bottom
-                if state['last_y'] < self.detection_line < center_y:
-                    self.entry_count += 1
-                    self.unique_visitors.add(track_id)
-                    state['crossed'] = True
-                    events.append({
-                        'track_id': track_id,
-                        'event_type': 'entry',
-                        'bbox': (x, y, w, h)
-                    })
-
-                # Exit: from bottom to top  
-                elif state['last_y'] > self.detection_line > center_y:
-                    self.exit_count += 1
-                    state['crossed'] = True
-                    events.append({
-                        'track_id': track_id,
-                        'event_type': 'exit',
-                        'bbox': (x, y, w, h)
-                    })
-
-            state['last_y'] = center_y
+            x, y, w, h = boxes[index]
+            events.append({
+                'track_id': track_id,
+                'event_type': event_type,
+                'bbox': (int(round(x)), int(round(y)), int(round(w)), int(round(h)))
+            })
 
+        store.counter_last_y[slots] = center_y
         return events
 
+    @staticmethod
+    def _visitor_key(store, slot, track_id):
+        """Re-identified visitor when known (see ReIdentifier), else the track itself"""
+        visitor_ids = getattr(store, 'visitor_ids', None)
+        if visitor_ids is not None and visitor_ids[slot] >= 0:
+            return ('visitor', int(visitor_ids[slot]))
+        return ('track', track_id)
+
     def get_stats(self):
         """Get current statistics"""
         return {
@@ -351,69 +2571,834 @@ class VisitorCounter:
             'current_occupancy': max(0, self.entry_count - self.exit_count)
         }
 
+def crop_quality(crop, confidence, visible_fraction):
+    """Cheap face crop score: size x sharpness (Laplacian variance) x confidence x visibility"""
+    height, width = crop.shape[:2]
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+
+    # Sharpness is measured on at most 64 px so large faces cost the same
+    scale = 64.0 / max(height, width)
+    if scale < 1.0:
+        gray = cv2.resize(gray, (max(1, int(width * scale)), max(1, int(height * scale))),
+                          interpolation=cv2.INTER_AREA)
+    _, std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_32F))
+    sharpness = float(std[0, 0]) ** 2
+    return np.sqrt(width * height) * np.log1p(sharpness) * confidence * visible_fraction
+
+class BestCropSelector:
+    """Pick the best face crop per track instead of saving the crossing frame
+
+    Every measured frame the crops of the tracks that can still produce an
+    event go into a bounded per-track buffer (last size candidates) with a
+    quality score: tracks within band pixels of the counting line that have
+    not crossed yet, and tracks with a pending event. An event is held for
+    settle_frames after the crossing, or until its track ends, and then only
+    the best buffered crop is handed out for encoding.
+    """
+    def __init__(self, size=5, settle_frames=10, band=100):
+        self.size = size
+        self.settle_frames = settle_frames
+        self.band = band
+        self.buffers = {}  # track_id -> deque of (score, crop)
+        self.pending = []  # (ready frame index, event)
+        self.candidates = 0
+        self.selected = 0
+
+    def add(self, store, slots, frame, line):
+        """Buffer the crops of the tracks at slots that are near line or have a pending event"""
+        if not len(slots):
+            return
+        boxes = store.boxes[slots]
+        center_y = boxes[:, 1] + boxes[:, 3] / 2.0
+        wanted = ~store.counter_crossed[slots] & (np.abs(center_y - line) <= self.band)
+        if self.pending:
+            pending_ids = np.fromiter((event['track_id'] for _, event in self.pending), dtype=np.int64)
+            wanted |= np.isin(store.ids[slots], pending_ids)
+        slots = slots[wanted]
+        if not len(slots):
+            return
+
+        frame_h, frame_w = frame.shape[:2]
+        boxes = np.round(boxes[wanted]).astype(int)
+        for slot, (x, y, w, h) in zip(slots.tolist(), boxes.tolist()):
+            left, top = max(0, x), max(0, y)
+            right, bottom = min(frame_w, x + w), min(frame_h, y + h)
+            if right <= left or bottom <= top:
+                continue
+
+            # Copies, so buffered crops don't keep whole frames alive
+            crop = frame[top:bottom, left:right].copy()
+            visible = (right - left) * (bottom - top) / float(max(1, w * h))
+            score = crop_quality(crop, float(store.confidences[slot]), visible)
+
+            track_id = int(store.ids[slot])
+            buffer = self.buffers.get(track_id)
+            if buffer is None:
+                buffer = self.buffers[track_id] = deque(maxlen=self.size)
+            buffer.append((score, crop))
+            self.candidates += 1
+
+    def schedule(self, event, frame_index):
+        """Hold an event until its track has settled past the crossing"""
+        self.pending.append((frame_index + self.settle_frames, event))
+
+    def _best(self, track_id):
+        buffer = self.buffers.get(track_id)
+        if not buffer:
+            return None
+        self.selected += 1
+        return max(buffer, key=lambda candidate: candidate[0])[1]
+
+    def ready(self, frame_index, active_ids):
+        """(event, best crop) for settled events and ended tracks; crop may be None"""
+        active_ids = set(active_ids)
+        due, waiting = [], []
+        for ready_frame, event in self.pending:
+            if frame_index >= ready_frame or event['track_id'] not in active_ids:
+                due.append((event, self._best(event['track_id'])))
+            else:
+                waiting.append((ready_frame, event))
+        self.pending = waiting
+
+        # Buffers of ended tracks are no longer needed
+        waiting_ids = {event['track_id'] for _, event in waiting}
+        for track_id in [t for t in self.buffers if t not in active_ids and t not in waiting_ids]:
+            del self.buffers[track_id]
+        return due
+
+    def drain(self):
+        """Hand out every pending event (shutdown)"""
+        due = [(event, self._best(event['track_id'])) for _, event in self.pending]
+        self.pending = []
+        self.buffers.clear()
+        return due
+
+    def get_stats(self):
+        return {'candidates': self.candidates, 'saved': self.selected, 'pending': len(self.pending)}
+
+class FrameGrabber:
+    """Threaded frame reader with a bounded ring buffer
+
+    Policies:
+        drop_oldest - never block the reader; when the buffer is full the
+                      oldest frame is discarded (live cameras / RTSP)
+        block       - the reader waits for free space (video files)
+
+    The grabber owns the capture once started: stop() releases it, or hands
+    the release to the reader thread when that is still stuck in cap.read()
+    (stalled RTSP), since releasing a capture mid-read is unsafe.
+    """
+    POLICIES = ("drop_oldest", "block")
+
+    def __init__(self, cap, buffer_size=4, policy="drop_oldest", logger=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown capture policy: {policy}")
+
+        self.cap = cap
+        self.logger = logger or get_logger()
+        self.buffer_size = max(1, int(buffer_size))
+        self.policy = policy
+        self.buffer = deque()
+        self.condition = threading.Condition()
+        self.running = False
+        self.finished = False
+        self.release_on_exit = False
+        self.thread = None
+
+        # Counters
+        self.frames_read = 0
+        self.frames_dropped = 0
+
+    def start(self):
+        """Start the reader thread"""
+        self.running = True
+        self.thread = threading.Thread(target=self._reader, name="FrameGrabber", daemon=True)
+        self.thread.start()
+        return self
+
+    def _reader(self):
+        """Read frames from the capture into the ring buffer"""
+        try:
+            while self.running:
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+
+                with self.condition:
+                    if self.policy == "block":
+                        while self.running and len(self.buffer) >= self.buffer_size:
+                            self.condition.wait(0.1)
+                    elif len(self.buffer) >= self.buffer_size:
+                        self.buffer.popleft()
+                        self.frames_dropped += 1
+
+                    self.buffer.append(frame)
+                    self.frames_read += 1
+                    self.condition.notify_all()
+        except Exception as e:
+            # Treated as the end of the stream, so the main loop doesn't wait forever
+            self.logger.error(f"Frame reader failed: {e}", key="capture.read")
+        finally:
+            with self.condition:
+                self.finished = True
+                if self.release_on_exit:
+                    self.cap.release()
+                self.condition.notify_all()
+
+    def read(self, timeout=1.0):
+        """Get the next frame, returns (ret, frame) like cv2.VideoCapture.read
+
+        With drop_oldest the freshest frame is returned and any older queued
+        frames are dropped, so processing never falls behind the stream.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        with self.condition:
+            while not self.buffer:
+                if self.finished or not self.running:
+                    return False, None
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False, None
+                self.condition.wait(remaining)
+
+            if self.policy == "drop_oldest":
+                frame = self.buffer.pop()
+                self.frames_dropped += len(self.buffer)
+                self.buffer.clear()
+            else:
+                frame = self.buffer.popleft()
+
+            self.condition.notify_all()
+            return True, frame
+
+    def read_many(self, max_frames, timeout=1.0, max_wait=0.01):
+        """Get up to max_frames queued frames in order (for batched detection)
+
+        Waits up to timeout for the first frame, then at most max_wait for the
+        batch to fill. With drop_oldest only the freshest frame is returned.
+        """
+        ret, frame = self.read(timeout=timeout)
+        if not ret:
+            return []
+        frames = [frame]
+        if self.policy == "drop_oldest":
+            return frames
+
+        deadline = time.time() + max_wait
+        while len(frames) < max_frames:
+            ret, frame = self.read(timeout=max(0.0, deadline - time.time()))
+            if not ret:
+                break
+            frames.append(frame)
+        return frames
+
+    def is_finished(self):
+        """True once the source is exhausted and the buffer is drained"""
+        with self.condition:
+            return self.finished and not self.buffer
+
+    def get_stats(self):
+        """Get capture counters"""
+        with self.condition:
+            return {
+                'frames_read': self.frames_read,
+                'frames_dropped': self.frames_dropped,
+                'frames_queued': len(self.buffer)
+            }
+
+    def stop(self):
+        """Stop the reader thread and release the capture
+
+        Returns False when the reader is still blocked in cap.read(); it then
+        releases the capture itself once the read returns.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+
+        with self.condition:
+            if self.thread is not None and not self.finished:
+                self.release_on_exit = True
+                return False
+        self.cap.release()
+        return True
+
+def merge_regions(regions, frame_shape):
+    """Clip regions (x, y, w, h) to the frame and merge overlapping ones"""
+    frame_h, frame_w = frame_shape[:2]
+    boxes = []
+    for (x, y, w, h) in regions:
+        x1, y1 = max(0, int(x)), max(0, int(y))
+        x2, y2 = min(frame_w, int(x + w)), min(frame_h, int(y + h))
+        if x2 > x1 and y2 > y1:
+            boxes.append([x1, y1, x2, y2])
+
+    # Repeat until no pair overlaps (merging can create new overlaps)
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        for box in boxes:
+            for other in result:
+                if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                    other[0], other[1] = min(other[0], box[0]), min(other[1], box[1])
+                    other[2], other[3] = max(other[2], box[2]), max(other[3], box[3])
+                    merged = True
+                    break
+            else:
+                result.append(box)
+        boxes = result
+
+    return [(x1, y1, x2 - x1, y2 - y1) for x1, y1, x2, y2 in boxes]
+
+class MotionGate:
+    """Skip detection when nothing moves (MOG2 on a downscaled grayscale copy)
+
+    check() returns the motion regions in frame coordinates; an empty list
+    means no foreground blob exceeded min_area_ratio of the frame.
+    """
+    def __init__(self, downscale=0.25, min_area_ratio=0.002, padding=0.15,
+                 full_frame_ratio=0.6, history=300, var_threshold=25):
+        self.downscale = downscale
+        self.min_area_ratio = min_area_ratio
+        self.padding = padding
+        self.full_frame_ratio = full_frame_ratio
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(
+            history=history, varThreshold=var_threshold, detectShadows=False
+        )
+        self.kernel = np.ones((3, 3), dtype=np.uint8)
+
+        # Metrics
+        self.frames = 0
+        self.skipped = 0
+        self.region_scans = 0
+        self.full_detect_time = None  # EMA of a full-frame detection, seconds
+        self.pixel_time = None  # EMA of detector seconds per scanned pixel (region scans)
+        self.saved_time = 0.0
+
+    def check(self, frame):
+        """Update the background model, return motion regions (x, y, w, h)"""
+        self.frames += 1
+        small = cv2.resize(frame, None, fx=self.downscale, fy=self.downscale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        mask = self.subtractor.apply(gray)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel)
+        mask = cv2.dilate(mask, self.kernel, iterations=2)
+
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+        min_area = self.min_area_ratio * mask.shape[0] * mask.shape[1]
+        blobs = stats[1:count]
+        blobs = blobs[blobs[:, cv2.CC_STAT_AREA] >= min_area]
+        if len(blobs) == 0:
+            return []
+
+        # Back to frame coordinates with some padding around each blob
+        scale = 1.0 / self.downscale
+        regions = []
+        for x, y, w, h, _ in blobs:
+            pad_x, pad_y = w * self.padding, h * self.padding
+            regions.append(((x - pad_x) * scale, (y - pad_y) * scale,
+                            (w + 2 * pad_x) * scale, (h + 2 * pad_y) * scale))
+        return merge_regions(regions, frame.shape)
+
+    def plan(self, frame, track_boxes):
+        """Decide what to scan: [] = skip, None = full frame, else list of regions
+
+        Existing tracks are always rescanned (padded boxes only, not the
+        whole frame) so people standing still keep their detections.
+        """
+        motion = self.check(frame)
+        if not motion and not track_boxes:
+            return []
+
+        regions = merge_regions(motion + self._pad_boxes(track_boxes), frame.shape)
+        covered = sum(w * h for _, _, w, h in regions)
+        if covered >= self.full_frame_ratio * frame.shape[0] * frame.shape[1]:
+            return None  # Scanning the regions would cost about as much as the full frame
+        return regions
+
+    def _pad_boxes(self, boxes):
+        """Grow track boxes so the face is still inside next frame"""
+        padded = []
+        for (x, y, w, h) in boxes:
+            padded.append((x - w * 0.5, y - h * 0.5, w * 2.0, h * 2.0))
+        return padded
+
+    def record(self, plan, seconds, frame_shape):
+        """Account detector time for a frame handled with the given plan
+
+        Savings are measured against full-frame runs; until there has been
+        one (e.g. every frame is limited to an ROI) the full-frame cost is
+        estimated from the time per scanned pixel of region scans.
+        """
+        frame_area = frame_shape[0] * frame_shape[1]
+        if plan is None:
+            if self.full_detect_time is None:
+                self.full_detect_time = seconds
+            else:
+                self.full_detect_time = 0.9 * self.full_detect_time + 0.1 * seconds
+        else:
+            if plan:
+                per_pixel = seconds / max(1, sum(w * h for _, _, w, h in plan))
+                self.pixel_time = per_pixel if self.pixel_time is None else 0.9 * self.pixel_time + 0.1 * per_pixel
+            full_time = self.full_detect_time
+            if full_time is None and self.pixel_time is not None:
+                full_time = self.pixel_time * frame_area
+            if full_time is not None:
+                self.saved_time += max(0.0, full_time - seconds)
+        if plan == []:
+            self.skipped += 1
+        elif plan is not None:
+            self.region_scans += 1
+
+    def get_stats(self):
+        """Get gate metrics"""
+        return {
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'skip_rate': round(self.skipped / self.frames, 3) if self.frames else 0.0,
+            'region_scans': self.region_scans,
+            'saved_detector_seconds': round(self.saved_time, 2)
+        }
+
+def intersect_regions(regions, limits):
+    """Intersect two lists of regions (x, y, w, h), dropping empty overlaps"""
+    result = []
+    for (x, y, w, h) in regions:
+        for (lx, ly, lw, lh) in limits:
+            x1, y1 = max(x, lx), max(y, ly)
+            x2, y2 = min(x + w, lx + lw), min(y + h, ly + lh)
+            if x2 > x1 and y2 > y1:
+                result.append((x1, y1, x2 - x1, y2 - y1))
+    return result
+
+class DetectionROI:
+    """Restrict detection to a band around the counting line and/or polygons
+
+    Detection runs on the bounding rectangles of the ROI (views of the
+    frame); detections whose center falls outside every polygon are dropped.
+    """
+    def __init__(self, band=None, polygons=None):
+        self.band = band
+        self.polygons = [np.asarray(polygon, dtype=np.int32).reshape(-1, 1, 2) for polygon in polygons or []]
+        self._cache_key = None
+        self._regions = []
+
+    def regions(self, frame_shape, detection_line):
+        """Detection rectangles for this resolution and line (computed once)"""
+        key = (frame_shape[:2], detection_line)
+        if key != self._cache_key:
+            frame_h, frame_w = frame_shape[:2]
+            rects = []
+            if self.band:
+                rects.append((0, detection_line - self.band, frame_w, 2 * self.band))
+            for polygon in self.polygons:
+                rects.append(cv2.boundingRect(polygon))
+            self._regions = merge_regions(rects, frame_shape)
+            self._cache_key = key
+        return self._regions
+
+    def filter(self, detections):
+        """Drop detections (N, 5) centered outside the polygons (band-only ROIs keep everything)"""
+        if not self.polygons or not len(detections):
+            return detections
+
+        centers = detections[:, :2] + detections[:, 2:4] / 2.0
+        keep = np.zeros(len(detections), dtype=bool)
+        if self.band:
+            keep |= np.abs(centers[:, 1] - self._cache_key[1]) <= self.band
+        for i in np.flatnonzero(~keep).tolist():
+            center = (float(centers[i, 0]), float(centers[i, 1]))
+            keep[i] = any(cv2.pointPolygonTest(polygon, center, False) >= 0 for polygon in self.polygons)
+        return detections[keep]
+
+class LatencyController:
+    """Hold a per-frame latency budget on live streams
+
+    Keeps running averages of the frame time and each pipeline stage. While
+    over budget it degrades one knob at a time (annotation off, smaller
+    detector input, coarser Haar scale, larger detection stride, dropping
+    stale frames); when comfortably under budget it restores them in reverse
+    order. Every change is logged. The stride goes last and only up to
+    stride_limit, since every skipped frame is a gap the tracker has to
+    bridge to keep line crossings.
+
+    One controller serves all cameras sharing a detector: camera knobs are
+    changed on every camera at once and the detector's knobs have a single
+    owner, so undo steps never fight another camera's changes. The input
+    size knob depends on the detector: YOLO gets a smaller imgsz, Haar and
+    YuNet a downscaled frame; fixed-input models (ONNX, SSD) are skipped.
+    """
+    YOLO_IMGSZ_STEPS = (640, 480, 320)
+    SCALED_INPUT_DETECTORS = ("opencv", "yunet")
+
+    def __init__(self, systems, budget_ms, cooldown=15, recover_ratio=0.6,
+                 stride_limit=2, min_input_scale=0.4, haar_scale_limit=1.4):
+        self.systems = systems if isinstance(systems, (list, tuple)) else [systems]
+        self.detector = self.systems[0].face_detector
+        self.logger = self.systems[0].logger
+        self.budget = budget_ms / 1000.0
+        self.cooldown = cooldown * len(self.systems)  # Frames from all cameras count
+        self.recover_ratio = recover_ratio
+        self.stride_limit = stride_limit
+        self.min_input_scale = min_input_scale
+        self.haar_scale_limit = haar_scale_limit
+
+        self.frame_time = None
+        self.stage_times = {}
+        self.frames_since_change = 0
+        self.applied = []  # Stack of steps, each a list of (target, attribute, previous value)
+        self.adjustments = 0
+
+    def observe(self, frame_seconds, stage_times):
+        """Record one processed frame and adjust the knobs if needed"""
+        self.frame_time = frame_seconds if self.frame_time is None else 0.9 * self.frame_time + 0.1 * frame_seconds
+        for stage, seconds in stage_times.items():
+            previous = self.stage_times.get(stage, seconds)
+            self.stage_times[stage] = 0.9 * previous + 0.1 * seconds
+
+        self.frames_since_change += 1
+        if self.frames_since_change < self.cooldown:
+            return
+
+        change = None
+        if self.frame_time > self.budget:
+            change = self._degrade()
+        elif self.frame_time < self.budget * self.recover_ratio and self.applied:
+            change = self._restore()
+
+        if change:
+            self.frames_since_change = 0
+            self.adjustments += 1
+            stages = ", ".join(f"{stage} {seconds * 1000:.1f}" for stage, seconds in self.stage_times.items())
+            self.logger.log(
+                f"Latency controller: {change} (avg {self.frame_time * 1000:.1f} ms/frame, "
+                f"budget {self.budget * 1000:.1f} ms; stages ms: {stages})"
+            )
+
+    def _set(self, changes, description):
+        """Apply one degradation step ([(target, attribute, value)]) and remember how to undo it"""
+        self.applied.append([(target, attribute, getattr(target, attribute)) for target, attribute, _ in changes])
+        for target, attribute, value in changes:
+            setattr(target, attribute, value)
+        return description
+
+    def _degrade(self):
+        """Apply the next cheapest degradation, returns its description (None if exhausted)"""
+        systems = self.systems
+        detector = self.detector
+
+        annotated = [system for system in systems if system.annotate]
+        if annotated:
+            return self._set([(system, 'annotate', False) for system in annotated], "annotation off")
+
+        if detector.detector_type == "yolo":
+            smaller = [size for size in self.YOLO_IMGSZ_STEPS if size < detector.yolo_imgsz]
+            if smaller:
+                return self._set([(detector, 'yolo_imgsz', smaller[0])], f"YOLO imgsz -> {smaller[0]}")
+        elif detector.detector_type in self.SCALED_INPUT_DETECTORS and detector.input_scale > self.min_input_scale:
+            scale = round(max(self.min_input_scale, detector.input_scale * 0.75), 2)
+            return self._set([(detector, 'input_scale', scale)], f"detector input scale -> {scale}")
+
+        if detector.detector_type == "opencv" and detector.haar_scale_factor < self.haar_scale_limit:
+            factor = round(detector.haar_scale_factor + 0.1, 2)
+            return self._set([(detector, 'haar_scale_factor', factor)], f"Haar scaleFactor -> {factor}")
+
+        strides = []
+        for system in systems:
+            if system.detect_stride == "auto":
+                if system.max_stride < self.stride_limit:
+                    strides.append((system, 'max_stride', system.max_stride + 1))
+            elif system.detect_stride < self.stride_limit:
+                strides.append((system, 'detect_stride', system.detect_stride + 1))
+        if strides:
+            return self._set(strides, f"{strides[0][1].replace('_', ' ')} -> {strides[0][2]}")
+
+        blocking = [system.grabber for system in systems if system.grabber.policy == "block"]
+        if blocking:
+            return self._set([(grabber, 'policy', "drop_oldest") for grabber in blocking],
+                             "shedding load: dropping stale frames")
+
+        return None
+
+    def _restore(self):
+        """Undo the most recent degradation"""
+        step = self.applied.pop()
+        for target, attribute, value in step:
+            setattr(target, attribute, value)
+        return f"restored {step[0][1]} -> {step[0][2]}"
+
+    def get_stats(self):
+        """Get controller state"""
+        return {
+            'avg_frame_ms': round(self.frame_time * 1000, 1) if self.frame_time is not None else None,
+            'budget_ms': round(self.budget * 1000, 1),
+            'adjustments': self.adjustments,
+            'active_degradations': [step[0][1] for step in self.applied]
+        }
+
+# Detection plan/result for stride frames: tracks are predicted, the detector doesn't run
+CARRY_FORWARD = "carry_forward"
+
 class FaceTrackingSystem:
     """Main system class"""
-    def __init__(self, video_source=0):
-        # Initialize components
-        self.logger = SimpleLogger()
-        self.face_detector = SimpleFaceDetector()
+    def __init__(self, video_source=0, capture_policy="auto", buffer_size=4,
+                 camera_id=None, face_detector=None, logger=None, database=None,
+                 motion_gate=False, motion_threshold=0.002, roi_band=None, roi_polygons=None,
+                 detect_stride=1, max_stride=4, latency_budget_ms=None, reidentifier=None,
+                 crop_buffer=5, crop_settle=10, crop_band=None):
+        # Initialize components (detector, logger and database can be shared between cameras)
+        self.camera_id = camera_id
+        self.logger = logger or get_logger()
+        self.face_detector = face_detector or SimpleFaceDetector()
         self.tracker = SimpleTracker()
-        self.database = SimpleDatabase()
+        self.owns_database = database is None
+        self.database = database or SimpleDatabase()
+        self.window_name = 'Face Tracking System'
+        if camera_id is not None:
+            self.window_name = f"Face Tracking System - {camera_id}"
 
         # Initialize video capture
-        self.cap = cv2.VideoCapture(video_source)
+        with STARTUP.measure("open video source"):
+            self.cap = cv2.VideoCapture(video_source)
         if not self.cap.isOpened():
             raise ValueError(f"Could not open video source: {video_source}")
 
         # Get frame dimensions
         frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         frame_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.frame_height = frame_height  # The capture belongs to the grabber thread once started
 
         self.visitor_counter = VisitorCounter(frame_height)
 
+        # Event images use the best recent crop of the track
+        # (only near the line: tracks elsewhere can't produce an event soon)
+        self.crop_selector = BestCropSelector(size=crop_buffer, settle_frames=crop_settle,
+                                              band=crop_band or max(1, frame_height // 4))
+
+        # Optional appearance re-ID (shared between cameras to follow visitors across them)
+        self.reidentifier = reidentifier
+
+        # Read frames on a separate thread so slow frames don't back up the decoder
+        if capture_policy == "auto":
+            capture_policy = "block" if self._is_file_source(video_source) else "drop_oldest"
+        self.grabber = FrameGrabber(self.cap, buffer_size=buffer_size, policy=capture_policy,
+                                    logger=self.logger)
+
+        # Optional motion gate in front of the detector
+        self.motion_gate = MotionGate(min_area_ratio=motion_threshold) if motion_gate else None
+
+        # Optional region of interest (band around the counting line and/or polygons)
+        self.roi = DetectionROI(roi_band, roi_polygons) if (roi_band or roi_polygons) else None
+
+        # Detection stride: run the detector every K frames ("auto" adapts K to the tracks)
+        self.detect_stride = detect_stride
+        self.max_stride = max(1, int(max_stride))
+        self.frames_since_detection = None
+        self.detections_run = 0
+
         # Runtime variables
         self.frame_count = 0
         self.start_time = time.time()
+        self.last_slots = NO_SLOTS  # Tracker store slots visible in the last frame
+        self.annotate = True
+        self.stage_times = {}
+
+        # Optional latency budget controller (live streams)
+        self.latency_controller = None
+        if latency_budget_ms:
+            self.latency_controller = LatencyController([self], latency_budget_ms)
+
+        self.logger.log(f"Face tracking system initialized successfully{self._camera_tag()}")
 
-        self.logger.log("Face tracking system initialized successfully")
+    def _camera_tag(self):
+        """Suffix identifying the camera in log messages"""
+        return f" [{self.camera_id}]" if self.camera_id is not None else ""
 
-    def process_frame(self, frame):
-        """Process a single frame"""
+    @staticmethod
+    def _is_file_source(video_source):
+        """Check whether the source is a local video file (not a camera or stream)"""
+        if isinstance(video_source, int):
+            return False
+        return "://" not in str(video_source) and os.path.isfile(str(video_source))
+
+    def current_stride(self):
+        """Frames between detector runs
+
+        A visible track with a single measurement has no velocity estimate
+        yet, so the detector runs on the next frame in every mode. In auto
+        mode it also runs every frame while a track is about to reach the
+        counting line (so crossings are measured, not predicted) and up to
+        max_stride frames apart otherwise.
+        """
+        store = self.tracker.store
+        slots = store.active_slots()
+        slots = slots[store.disappeared[slots] == 0]
+        if (store.ages[slots] == 0).any():
+            return 1
+        if self.detect_stride != "auto":
+            return max(1, int(self.detect_stride))
+
+        vy = np.abs(store.mean[slots, 5])
+        moving = vy > 1e-3
+        if not moving.any():
+            return self.max_stride
+
+        # Frames until each moving track's center reaches the line
+        distance = np.abs(store.mean[slots, 1] - self.visitor_counter.detection_line)
+        frames_to_line = int((distance[moving] / vy[moving]).min())
+        return max(1, min(self.max_stride, frames_to_line))
+
+    def plan_detection(self, frame):
+        """What to detect in this frame: None = full frame, [] = skip, else regions
+
+        Returns CARRY_FORWARD on stride frames where tracks are predicted instead.
+        """
+        if self.frames_since_detection is not None:
+            self.frames_since_detection += 1
+            if self.frames_since_detection < self.current_stride() and len(self.last_slots):
+                return CARRY_FORWARD
+        self.frames_since_detection = 0
+        self.detections_run += 1
+
+        plan = None
+        if self.motion_gate is not None:
+            track_boxes = self.tracker.store.boxes[self.last_slots].astype(int).tolist()
+            plan = self.motion_gate.plan(frame, track_boxes)
+
+        if self.roi is not None:
+            roi_regions = self.roi.regions(frame.shape, self.visitor_counter.detection_line)
+            plan = roi_regions if plan is None else intersect_regions(plan, roi_regions)
+        return plan
+
+    @staticmethod
+    def detect_frames(face_detector, items):
+        """Detect faces for a list of (system, frame), one (N, 5) detection array per item
+
+        Full-frame detections are batched into one detector call; gated
+        frames are skipped or scanned only in their motion regions.
+        """
+        plans = [system.plan_detection(frame) for system, frame in items]
+        results = [EMPTY_DETECTIONS for _ in items]
+        for i, plan in enumerate(plans):
+            if plan is CARRY_FORWARD:
+                results[i] = CARRY_FORWARD
+
+        full = [i for i, plan in enumerate(plans) if plan is None]
+        if full:
+            start = time.perf_counter()
+            faces_batch = face_detector.detect_faces_batch([items[i][1] for i in full], as_array=True)
+            per_frame = (time.perf_counter() - start) / len(full)
+            for i, faces in zip(full, faces_batch):
+                results[i] = faces
+
+        for i, (system, frame) in enumerate(items):
+            plan = plans[i]
+            if plan is CARRY_FORWARD:
+                system.stage_times['detect'] = 0.0
+                continue
+            if plan is None:
+                system.stage_times['detect'] = per_frame
+                if system.motion_gate is not None:
+                    system.motion_gate.record(plan, per_frame, frame.shape)
+                continue
+
+            start = time.perf_counter()
+            if plan:
+                results[i] = face_detector.detect_faces_in_regions(frame, plan, as_array=True)
+            system.stage_times['detect'] = time.perf_counter() - start
+            if system.motion_gate is not None:
+                system.motion_gate.record(plan, system.stage_times['detect'], frame.shape)
+
+        # Drop detections outside the ROI polygons
+        for i, (system, _) in enumerate(items):
+            if system.roi is not None and plans[i] is not CARRY_FORWARD:
+                results[i] = system.roi.filter(results[i])
+
+        return results
+
+    def process_frame(self, frame, faces=None):
+        """Process a single frame (faces can be passed in when detected in a batch)"""
         # Face detection
-        faces = self.face_detector.detect_faces(frame)
+        if faces is None:
+            faces = self.detect_frames(self.face_detector, [(self, frame)])[0]
+
+        start = time.perf_counter()
+
+        # Object tracking (stride frames carry the tracks forward without detections)
+        if faces is CARRY_FORWARD:
+            slots = self.tracker.predict()
+            events = []  # Crossings are only counted on measured positions
+        else:
+            slots = self.tracker.update(faces)
 
-        # Object tracking
-        tracked_objects = self.tracker.update(faces)
+            # Resolve visitor identities before counting (embeds only the tracks that are due)
+            if self.reidentifier is not None:
+                self.reidentifier.update(self.tracker.store, slots, frame, self.tracker.frame_index)
 
-        # Visitor counting
-        events = self.visitor_counter.update(tracked_objects)
+            # Visitor counting
+            events = self.visitor_counter.update(self.tracker.store, slots)
+        self.last_slots = slots
+        tracked = time.perf_counter()
+        self.stage_times['track'] = tracked - start
 
-        # Handle events
+        # Handle events (saved once the track settled, with its best crop)
         for event in events:
-            track_id = event['track_id']
-            event_type = event['event_type']
-            bbox = event['bbox']
+            event['timestamp'] = datetime.now()
+            self.crop_selector.schedule(event, self.tracker.frame_index)
+            self.logger.log(f"{event['event_type'].upper()}: Track {event['track_id']}{self._camera_tag()}")
 
-            # Crop face region
-            x, y, w, h = bbox
-            face_crop = frame[y:y+h, x:x+w]
+        # Candidate crops for the event images (after scheduling, so crossing frames count)
+        if faces is not CARRY_FORWARD:
+            self.crop_selector.add(self.tracker.store, slots, frame, self.visitor_counter.detection_line)
 
-            # Save face image
-            image_path = self.logger.save_image(face_crop, f"face_{track_id}_{event_type}")
+        store = self.tracker.store
+        active_ids = store.ids[store.active].tolist()
+        for event, crop in self.crop_selector.ready(self.tracker.frame_index, active_ids):
+            self._save_event(event, crop)
 
-            # Log to database
-            self.database.log_event(track_id, event_type, image_path)
+        handled = time.perf_counter()
+        self.stage_times['events'] = handled - tracked
 
-            self.logger.log(f"{event_type.upper()}: Track {track_id}")
+        # Annotate frame (may be switched off by the latency controller)
+        if self.annotate:
+            annotated_frame = self.annotate_frame(frame, slots)
+        else:
+            annotated_frame = frame
+        self.stage_times['annotate'] = time.perf_counter() - handled
 
-        # Annotate frame
-        annotated_frame = self.annotate_frame(frame, faces, tracked_objects)
+        if self.latency_controller is not None:
+            frame_seconds = sum(self.stage_times.values())
+            self.latency_controller.observe(frame_seconds, self.stage_times)
 
         self.frame_count += 1
+        if STARTUP.mark_first_frame() and STARTUP.enabled:
+            for line in STARTUP.report():
+                self.logger.log(line)
         return annotated_frame
 
-    def annotate_frame(self, frame, faces, tracked_objects):
-        """Add annotations to frame"""
+    def _save_event(self, event, face_crop):
+        """Save the event image (if any) and log the event to the database"""
+        track_id = event['track_id']
+        event_type = event['event_type']
+
+        # Save face image
+        image_path = None
+        if face_crop is not None:
+            image_name = f"face_{track_id}_{event_type}"
+            if self.camera_id is not None:
+                image_name = f"{self.camera_id}_{image_name}"
+            image_path = self.logger.save_image(face_crop, image_name, dedup_scope=self.camera_id or '')
+
+        # Log to database
+        self.database.log_event(track_id, event_type, image_path, timestamp=event['timestamp'],
+                                camera_id=self.camera_id)
+
+    def annotate_frame(self, frame, slots):
+        """Add annotations to frame for the tracks at the given store slots"""
         result = frame.copy()
 
         # Draw detection line
@@ -422,7 +3407,7 @@ class FaceTrackingSystem:
                 (0, 255, 255), 2)
 
         # Draw face detections with tracking IDs
-        for track_id, (x, y, w, h, conf) in tracked_objects.items():
+        for track_id, (x, y, w, h, conf) in self.tracker.tracked_objects(slots).items():
             # Draw bounding box
             cv2.rectangle(result, (x, y), (x + w, y + h), (0, 255, 0), 2)
 
@@ -454,46 +3439,66 @@ class FaceTrackingSystem:
     def run(self):
         """Main processing loop"""
         self.logger.log("Starting face tracking system...")
+        self.grabber.start()
 
         try:
-            while True:
-                ret, frame = self.cap.read()
-                if not ret:
+            running = True
+            while running:
+                # A backlog of file frames is detected in one batch
+                frames = self.grabber.read_many(
+                    self.face_detector.max_batch_size,
+                    max_wait=self.face_detector.max_batch_wait
+                )
+                if not frames:
+                    if not self.grabber.is_finished():
+                        continue  # Slow source, keep waiting
                     self.logger.log("No more frames or camera disconnected")
                     break
 
-                # Process frame
-                processed_frame = self.process_frame(frame)
+                if len(frames) > 1:
+                    faces_batch = self.detect_frames(self.face_detector, [(self, frame) for frame in frames])
+                else:
+                    faces_batch = [None]
 
-                # Display frame
-                cv2.imshow('Face Tracking System', processed_frame)
+                for frame, faces in zip(frames, faces_batch):
+                    # Process frame
+                    processed_frame = self.process_frame(frame, faces)
 
-                # Handle key presses
-                key = cv2.waitKey(1) & 0xFF
-                if key == ord('q'):
-                    self.logger.log("Quit requested by user")
-                    break
-                elif key == ord('r'):
-                    # Reset counters
-                    self.visitor_counter = VisitorCounter(
-                        int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                    )
-                    self.logger.log("Counters reset")
-                elif key == ord('s'):
-                    # Save screenshot
-                    self.logger.save_image(processed_frame, "screenshot")
-                    self.logger.log("Screenshot saved")
+                    # Display frame
+                    cv2.imshow(self.window_name, processed_frame)
+
+                    # Handle key presses
+                    key = cv2.waitKey(1) & 0xFF
+                    if not self.handle_key(key, processed_frame):
+                        running = False
+                        break
 
         except KeyboardInterrupt:
             self.logger.log("System interrupted by user")
         except Exception as e:
-            self.logger.log(f"System error: {e}")
+            self.logger.error(f"System error: {e}")
         finally:
             self.cleanup()
 
+    def handle_key(self, key, processed_frame):
+        """Handle a key press, returns False when the user asked to quit"""
+        if key == ord('q'):
+            self.logger.log("Quit requested by user")
+            return False
+        elif key == ord('r'):
+            # Reset counters
+            self.visitor_counter = VisitorCounter(self.frame_height)
+            self.logger.log(f"Counters reset{self._camera_tag()}")
+        elif key == ord('s'):
+            # Save screenshot
+            name = "screenshot" if self.camera_id is None else f"{self.camera_id}_screenshot"
+            self.logger.save_image(processed_frame, name)
+            self.logger.log("Screenshot saved")
+        return True
+
     def cleanup(self):
         """Clean up resources"""
-        self.logger.log("Cleaning up...")
+        self.logger.log(f"Cleaning up{self._camera_tag()}...")
 
         # Get final statistics
         stats = self.visitor_counter.get_stats()
@@ -503,10 +3508,216 @@ class FaceTrackingSystem:
         self.logger.log(f"  Runtime: {runtime:.1f} seconds")
         self.logger.log(f"  Frames processed: {self.frame_count}")
         self.logger.log(f"  Final stats: {stats}")
+        self.logger.log(f"  Capture stats: {self.grabber.get_stats()}")
+        if self.motion_gate is not None:
+            self.logger.log(f"  Motion gate: {self.motion_gate.get_stats()}")
+        if self.detect_stride != 1:
+            self.logger.log(f"  Detector runs: {self.detections_run}/{self.frame_count} frames")
+        if self.latency_controller is not None:
+            self.logger.log(f"  Latency controller: {self.latency_controller.get_stats()}")
+        if self.reidentifier is not None:
+            self.logger.log(f"  Re-ID: {self.reidentifier.get_stats()}")
+
+        # Events still waiting for a better crop are saved now
+        for event, crop in self.crop_selector.drain():
+            self._save_event(event, crop)
+        self.logger.log(f"  Event crops: {self.crop_selector.get_stats()}")
+
+        # Every queued image is on disk before we exit
+        self.logger.flush_images()
+        self.logger.log(f"  Image writer: {self.logger.image_writer.get_stats()}")
+        if self.logger.deduplicator is not None:
+            self.logger.log(f"  Image dedup: {self.logger.deduplicator.get_stats()}")
+
+        # Commit queued events (a shared database is closed by its owner)
+        if self.owns_database:
+            self.database.close()
+        else:
+            self.database.flush()
+        self.logger.log(f"  Database: {self.database.get_stats()}")
 
-        # Release resources
-        self.cap.release()
+        # Release resources (the capture is released by the grabber)
+        if not self.grabber.stop():
+            self.logger.warning(f"Capture read still blocked{self._camera_tag()}, "
+                                "releasing it when the read returns", key="capture.stall")
         cv2.destroyAllWindows()
+        self.logger.flush()
+
+class MultiCameraSystem:
+    """Serve several video sources from one process with a shared detector
+
+    Each source gets its own tracker, visitor counter and camera_id. Frames
+    are interleaved round-robin: every camera processes at most one frame per
+    round and the starting camera rotates, so a fast source can't starve the
+    others.
+    """
+    def __init__(self, sources, face_detector=None, logger=None, latency_budget_ms=None, **system_options):
+        self.logger = logger or get_logger()
+        self.face_detector = face_detector or SimpleFaceDetector()
+        self.database = SimpleDatabase()
+        self.cameras = []
+
+        for source in sources:
+            options = dict(system_options)
+            if source.get('roi_polygons'):
+                options['roi_polygons'] = source['roi_polygons']
+            self.cameras.append(FaceTrackingSystem(
+                video_source=source['video_source'],
+                camera_id=source['camera_id'],
+                face_detector=self.face_detector,
+                logger=self.logger,
+                database=self.database,
+                **options
+            ))
+
+        # One latency controller owns the shared detector's knobs for all cameras
+        if latency_budget_ms:
+            controller = LatencyController(self.cameras, latency_budget_ms)
+            for camera in self.cameras:
+                camera.latency_controller = controller
+
+        self.round_start = 0
+        self.logger.log(f"Multi-camera system initialized with {len(self.cameras)} sources")
+
+    def _next_frames(self):
+        """Collect at most one fresh frame per camera, in fair rotating order
+
+        Cameras without a frame yet are polled again until the detector's
+        batch is full or its max wait deadline passes.
+        """
+        active = [camera for camera in self.cameras if not camera.grabber.is_finished()]
+        if not active:
+            return None
+
+        start = self.round_start % len(active)
+        self.round_start += 1
+
+        ready = []
+        pending = active[start:] + active[:start]
+        max_batch = self.face_detector.max_batch_size
+        deadline = time.time() + self.face_detector.max_batch_wait
+        while pending and len(ready) < max_batch:
+            waiting = []
+            for camera in pending:
+                if len(ready) >= max_batch:
+                    break
+                ret, frame = camera.grabber.read(timeout=0)
+                if ret:
+                    ready.append((camera, frame))
+                elif not camera.grabber.is_finished():
+                    waiting.append(camera)
+            pending = waiting
+            if not pending or time.time() >= deadline:
+                break
+            time.sleep(0.001)
+        return ready
+
+    def run(self):
+        """Main scheduling loop"""
+        self.logger.log("Starting multi-camera face tracking...")
+        for camera in self.cameras:
+            camera.grabber.start()
+
+        try:
+            running = True
+            while running:
+                ready = self._next_frames()
+                if ready is None:
+                    self.logger.log("All video sources finished")
+                    break
+                if not ready:
+                    time.sleep(0.002)  # Nothing buffered yet
+                    continue
+
+                # One detector call for the whole round
+                faces_batch = FaceTrackingSystem.detect_frames(self.face_detector, ready)
+
+                for (camera, frame), faces in zip(ready, faces_batch):
+                    processed_frame = camera.process_frame(frame, faces)
+                    cv2.imshow(camera.window_name, processed_frame)
+
+                    key = cv2.waitKey(1) & 0xFF
+                    if not camera.handle_key(key, processed_frame):
+                        running = False
+                        break
+
+        except KeyboardInterrupt:
+            self.logger.log("System interrupted by user")
+        except Exception as e:
+            self.logger.error(f"System error: {e}")
+        finally:
+            for camera in self.cameras:
+                camera.cleanup()
+            self.database.close()
+
+def parse_video_source(value):
+    """Convert a CLI/config video source to a camera index or path/URL"""
+    if isinstance(value, int):
+        return value
+    value = str(value).strip()
+    if "://" in value:
+        return value
+    try:
+        return int(value)  # Camera index
+    except ValueError:
+        return value  # File path
+
+def parse_tiles(value):
+    """Parse "COLSxROWS" into a (cols, rows) tuple"""
+    try:
+        cols, rows = (int(v) for v in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid tile grid: {value} (expected e.g. 3x2)")
+    if cols < 1 or rows < 1:
+        raise argparse.ArgumentTypeError(f"Invalid tile grid: {value}")
+    return cols, rows
+
+def parse_polygon(value):
+    """Parse "x1,y1;x2,y2;..." into a list of [x, y] points"""
+    points = [[int(float(v)) for v in point.split(",")] for point in value.split(";") if point.strip()]
+    if len(points) < 3 or any(len(point) != 2 for point in points):
+        raise argparse.ArgumentTypeError(f"Invalid polygon: {value}")
+    return points
+
+def parse_sources(source_args, config_path=None):
+    """Build the list of {camera_id, video_source} from CLI args and/or a JSON config
+
+    CLI entries are either "source" or "camera_id=source". The config file
+    uses {"sources": [{"camera_id": ..., "video_source": ...}, ...]} or the
+    single-camera {"video_source": ...} form. Config sources may also set
+    "roi_polygons": [[[x, y], ...], ...].
+    """
+    entries = []
+
+    if config_path:
+        with open(config_path) as f:
+            config = json.load(f)
+        config_sources = config.get('sources')
+        if config_sources is None and 'video_source' in config:
+            config_sources = [{'video_source': config['video_source']}]
+        for item in config_sources or []:
+            if isinstance(item, dict):
+                entries.append((item.get('camera_id'), item['video_source'], item.get('roi_polygons')))
+            else:
+                entries.append((None, item, None))
+
+    for item in source_args or []:
+        camera_id, sep, source = str(item).partition("=")
+        if sep and "://" not in camera_id:
+            entries.append((camera_id, source, None))
+        else:
+            entries.append((None, item, None))
+
+    sources = []
+    for i, (camera_id, source, roi_polygons) in enumerate(entries):
+        entry = {
+            'camera_id': camera_id or f"cam{i}",
+            'video_source': parse_video_source(source)
+        }
+        if roi_polygons:
+            entry['roi_polygons'] = roi_polygons
+        sources.append(entry)
+    return sources
 
 def main():
     """Main entry point"""
@@ -515,43 +3726,231 @@ def main():
                        help="Video source (0 for webcam, or path to video file)")
     parser.add_argument("--test", action="store_true",
                        help="Run quick test")
+    parser.add_argument("--startup-report", action="store_true",
+                       help="Log import, model load and first-frame times")
+    parser.add_argument("--benchmark-association", action="store_true",
+                       help="Time dense vs grid track association for 10-1000 detections and exit")
+    parser.add_argument("--capture-policy", default="auto",
+                       choices=["auto"] + list(FrameGrabber.POLICIES),
+                       help="Frame buffer policy (auto: block for files, drop_oldest for live sources)")
+    parser.add_argument("--buffer-size", type=int, default=4,
+                       help="Number of frames buffered by the capture thread")
+    parser.add_argument("--batch-size", type=int, default=8,
+                       help="Maximum frames per detector call (across cameras or queued file frames)")
+    parser.add_argument("--batch-wait", type=float, default=0.01,
+                       help="Maximum seconds to wait for a detector batch to fill")
+    parser.add_argument("--yolo-classes", type=int, nargs="+", default=[0],
+                       help="YOLO class ids to keep (0 = person for COCO weights)")
+    parser.add_argument("--detector", default="default",
+                       choices=["default", "auto"] + list(DETECTOR_REGISTRY),
+                       help="Face detector (auto: benchmark available detectors on the first frame, cached per machine)")
+    parser.add_argument("--accuracy-floor", type=float, default=0.7,
+                       help="Minimum relative accuracy a detector needs to be picked by --detector auto")
+    parser.add_argument("--tiles", type=parse_tiles,
+                       help="Detect on overlapping tiles, e.g. 3x2 for 4K cameras (merged with NMS)")
+    parser.add_argument("--tile-overlap", type=float, default=0.2,
+                       help="Fraction of each tile that overlaps its neighbours")
+    parser.add_argument("--backend", default="torch",
+                       choices=["torch"] + list(OnnxYoloBackend.ENGINES),
+                       help="YOLO inference backend (onnxruntime/openvino run an exported model without torch)")
+    parser.add_argument("--onnx-model",
+                       help=f"ONNX model path (default: {DEFAULT_ONNX_MODEL}, exported on first use)")
+    parser.add_argument("--calibration-dir",
+                       help="Folder of sample frames for int8 static quantization of the ONNX model")
+    parser.add_argument("--export-onnx", action="store_true",
+                       help="Export (and optionally quantize) the ONNX model, then exit")
+    parser.add_argument("--motion-gate", action="store_true",
+                       help="Skip detection when nothing moves, scan only motion regions otherwise")
+    parser.add_argument("--motion-threshold", type=float, default=0.002,
+                       help="Minimum foreground blob area (fraction of the frame) that counts as motion")
+    parser.add_argument("--roi-band", type=int,
+                       help="Only detect within this many pixels above/below the counting line")
+    parser.add_argument("--roi-polygon", type=parse_polygon, action="append",
+                       help="Only detect inside this polygon, \"x1,y1;x2,y2;x3,y3...\" (repeatable)")
+    parser.add_argument("--detect-stride", default="1",
+                       help="Run the detector every K frames and predict tracks in between (integer or 'auto')")
+    parser.add_argument("--max-stride", type=int, default=4,
+                       help="Largest stride used by --detect-stride auto")
+    parser.add_argument("--target-fps", type=float,
+                       help="Hold this frame rate by adapting detection quality (sets the latency budget)")
+    parser.add_argument("--latency-budget", type=float,
+                       help="Per-frame latency budget in milliseconds (alternative to --target-fps)")
+    parser.add_argument("--reid-model",
+                       help="Face embedding ONNX model; enables re-ID so returning visitors count once")
+    parser.add_argument("--reid-interval", type=int, default=10,
+                       help="Embed each track at most once every N frames (default: 10)")
+    parser.add_argument("--reid-threshold", type=float, default=0.5,
+                       help="Cosine similarity needed to reuse a visitor identity (default: 0.5)")
+    parser.add_argument("--reid-ttl", type=float, default=3600,
+                       help="Forget visitors not seen for this many seconds (default: 3600)")
+    parser.add_argument("--reid-capacity", type=int, default=10000,
+                       help="Maximum visitors kept in the re-ID index, least recently seen evicted first")
+    parser.add_argument("--crop-buffer", type=int, default=5,
+                       help="Candidate face crops kept per track for the event image (default: 5)")
+    parser.add_argument("--crop-settle", type=int, default=10,
+                       help="Frames to keep collecting crops after a crossing before saving (default: 10)")
+    parser.add_argument("--crop-band", type=int,
+                       help="Only collect crops within this many pixels of the counting line (default: frame height / 4)")
+    parser.add_argument("--image-format", default="jpg", choices=list(ImageWriter.FORMATS),
+                       help="Encoding of saved face images (default: jpg)")
+    parser.add_argument("--image-quality", type=int, default=90,
+                       help="JPEG/WebP quality of saved images (default: 90)")
+    parser.add_argument("--image-writers", type=int, default=2,
+                       help="Background threads encoding and writing images (default: 2)")
+    parser.add_argument("--image-queue", type=int, default=64,
+                       help="Images waiting to be written before the queue policy applies (default: 64)")
+    parser.add_argument("--image-policy", default="drop", choices=list(ImageWriter.POLICIES),
+                       help="When the image queue is full: drop the new image or block the frame loop")
+    parser.add_argument("--image-store", default="files", choices=["files", "archive"],
+                       help="Save images as separate files or appended to segment files in logs/archive")
+    parser.add_argument("--segment-size", type=int, default=256,
+                       help="Archive segment size in MB before rotating to a new segment (default: 256)")
+    parser.add_argument("--export-archive", metavar="DIR",
+                       help="Write every archived image to DIR as a plain file and exit")
+    parser.add_argument("--dedup", action="store_true",
+                       help="Reuse the image of a near-identical crop saved by the same camera moments ago")
+    parser.add_argument("--dedup-distance", type=int, default=3,
+                       help="Max differing dHash bits for a crop to count as a duplicate (default: 3)")
+    parser.add_argument("--dedup-ttl", type=float, default=10,
+                       help="Seconds a saved crop stays eligible as a duplicate target (default: 10)")
+    parser.add_argument("--dedup-capacity", type=int, default=256,
+                       help="Recent crop hashes kept for the duplicate check (default: 256)")
+    parser.add_argument("--log-level", default="INFO", choices=list(SimpleLogger.LEVELS),
+                       help="Minimum level written to logs/system.log (default: INFO)")
+    parser.add_argument("--log-max-mb", type=float, default=10,
+                       help="Rotate logs/system.log at this size in MB (default: 10)")
+    parser.add_argument("--log-rotate-hours", type=float,
+                       help="Also rotate logs/system.log after this many hours")
+    parser.add_argument("--sources", nargs="+",
+                       help="Several video sources served by one process (entries: source or camera_id=source)")
+    parser.add_argument("--config",
+                       help="JSON config file with a list of sources")
 
     args = parser.parse_args()
 
     if args.test:
         print("Running quick test...")
-        # Test basic imports
+        # Test basic imports (optional backends are only looked up, not imported)
         try:
             import cv2
             print("✅ OpenCV available")
             import numpy as np
             print("✅ NumPy available")
-            import scipy
-            print("✅ SciPy available")
+            if importlib.util.find_spec("scipy") is not None:
+                print("✅ SciPy available")
+            else:
+                print("⚠️  SciPy not available")
             if YOLO_AVAILABLE:
                 print("✅ YOLO available")
             else:
                 print("⚠️  YOLO not available, will use OpenCV")
+            if ONNXRUNTIME_AVAILABLE or OPENVINO_AVAILABLE:
+                print("✅ ONNX CPU backend available")
             print("✅ All basic dependencies working!")
             return
         except Exception as e:
             print(f"❌ Test failed: {e}")
             return
 
+    if args.export_archive:
+        archive = SegmentArchive()
+        count = archive.export(args.export_archive)
+        archive.close()
+        print(f"Exported {count} images to {args.export_archive}")
+        return
+
+    if args.benchmark_association:
+        print("Association benchmark (median ms per frame):")
+        for row in benchmark_association():
+            print(f"  {row['detections']:>5} detections: dense {row['dense_ms']:>9.3f} ms, "
+                  f"grid {row['grid_ms']:>8.3f} ms, x{row['speedup']} "
+                  f"(matches equal: {row['matches_equal']})")
+        return
+
+    STARTUP.enabled = args.startup_report
+
+    if args.export_onnx:
+        try:
+            export_onnx_model(onnx_path=args.onnx_model or DEFAULT_ONNX_MODEL,
+                              calibration_dir=args.calibration_dir)
+        except Exception as e:
+            print(f"❌ ONNX export failed: {e}")
+            sys.exit(1)
+        return
+
     try:
+        # One logger (and image writer pool) for the detector and all cameras
+        logger = set_logger(SimpleLogger(
+            ImageWriter(
+                workers=args.image_writers,
+                queue_size=args.image_queue,
+                policy=args.image_policy,
+                image_format=args.image_format,
+                quality=args.image_quality,
+                archive=SegmentArchive(max_segment_bytes=args.segment_size * 1024 * 1024)
+                if args.image_store == "archive" else None
+            ),
+            HashDeduplicator(args.dedup_capacity, args.dedup_distance, args.dedup_ttl) if args.dedup else None,
+            level=args.log_level,
+            max_bytes=args.log_max_mb * 1024 * 1024,
+            rotate_seconds=args.log_rotate_hours * 3600 if args.log_rotate_hours else None
+        ))
+
+        face_detector = SimpleFaceDetector(
+            max_batch_size=args.batch_size,
+            max_batch_wait=args.batch_wait,
+            yolo_classes=args.yolo_classes,
+            backend=args.backend,
+            onnx_model=args.onnx_model,
+            calibration_dir=args.calibration_dir,
+            detector=args.detector,
+            accuracy_floor=args.accuracy_floor,
+            load_async=True,
+            tiles=args.tiles,
+            tile_overlap=args.tile_overlap,
+            logger=logger
+        )
+
+        # Per-camera settings
+        system_options = {
+            'capture_policy': args.capture_policy,
+            'buffer_size': args.buffer_size,
+            'motion_gate': args.motion_gate,
+            'motion_threshold': args.motion_threshold,
+            'roi_band': args.roi_band,
+            'roi_polygons': args.roi_polygon,
+            'detect_stride': args.detect_stride if args.detect_stride == "auto" else int(args.detect_stride),
+            'max_stride': args.max_stride,
+            'latency_budget_ms': args.latency_budget or (1000.0 / args.target_fps if args.target_fps else None),
+            'crop_buffer': args.crop_buffer,
+            'crop_settle': args.crop_settle,
+            'crop_band': args.crop_band
+        }
+
+        # Optional re-ID, shared by all cameras
+        if args.reid_model:
+            system_options['reidentifier'] = ReIdentifier(
+                FaceEmbedder(args.reid_model),
+                VectorIndex(capacity=args.reid_capacity, ttl=args.reid_ttl),
+                interval=args.reid_interval,
+                threshold=args.reid_threshold
+            )
+
+        # Multi-camera mode: one process, one shared detector
+        if args.sources or args.config:
+            sources = parse_sources(args.sources, args.config)
+            if not sources:
+                raise ValueError("No video sources configured")
+            system = MultiCameraSystem(sources, face_detector=face_detector, logger=logger, **system_options)
+            system.run()
+            return
+
         # Parse video source
-        video_source = args.video
-        if video_source != "0" and not video_source.startswith("rtsp"):
-            # Try to convert to int for camera index, otherwise treat as file path
-            try:
-                video_source = int(video_source)
-            except ValueError:
-                pass  # Keep as string (file path)
-        elif video_source == "0":
-            video_source = 0
+        video_source = parse_video_source(args.video)
 
         # Initialize and run system
-        system = FaceTrackingSystem(video_source=video_source)
+        system = FaceTrackingSystem(video_source=video_source, face_detector=face_detector, logger=logger,
+                                    **system_options)
         system.run()
 
     except Exception as e: